@@ -0,0 +1,310 @@
+#!/usr/bin/python
+
+#-------------------------------------------------------------------------------
+#    Filename: benchmark.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Measures simulation and rendering speed of Toad's Adventure on
+#              every level, headless and with scripted input, and reports the
+#              results as JSON so runs on different commits can be compared.
+#-------------------------------------------------------------------------------
+
+import argparse
+import collections
+import itertools
+import json
+import platform
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+import pygame
+import toads_adventure
+import input_file
+from map import get_tile_flags
+from config import *
+
+BENCHMARK_FRAMES = 300 # simulated ticks per level and variant
+BENCHMARK_STRESS_NPCS = (250, 1000) # extra NPCs added for stress variants
+BENCHMARK_SEED = 1
+BENCHMARK_JUMP_INTERVAL = 40 # ticks between scripted jumps
+BENCHMARK_JUMP_LENGTH = 15 # ticks the jump key is held
+
+#-------------------------------------------------------------------------------
+#    Function: scripted_inputs
+#
+# Description: Generates the keys a player might press to run through a level:
+#              right is held throughout, and space is pressed periodically.
+#
+#      Inputs: None.
+#
+#     Outputs: Endless iterator of (keys, new_keys) tuples, one per tick, as
+#              built by 'Game.main_loop'.
+#-------------------------------------------------------------------------------
+def scripted_inputs():
+    tick = 0
+    while True:
+        keys = {pygame.K_RIGHT}
+        new_keys = set()
+        if tick % BENCHMARK_JUMP_INTERVAL < BENCHMARK_JUMP_LENGTH:
+            keys.add(pygame.K_SPACE)
+            if tick % BENCHMARK_JUMP_INTERVAL == 0:
+                new_keys.add(pygame.K_SPACE)
+        yield (frozenset(keys), frozenset(new_keys))
+        tick += 1
+
+#-------------------------------------------------------------------------------
+#    Function: get_flag_rows
+#
+# Description: Lists the exact flag bits of a map's tiles, row by row. A
+#              streamed map's chunks are decoded one row of chunks at a time
+#              rather than being loaded into the map, so it stays streamed.
+#
+#      Inputs: game_map - A 'Map'.
+#
+#     Outputs: Iterator of flag bits for each row of the map, from top to
+#              bottom, as sequences of 'map_width' values.
+#-------------------------------------------------------------------------------
+def get_flag_rows(game_map):
+    width = game_map.map_width
+    level = game_map.stream_level
+    if level is None:
+        for y in range(game_map.map_height):
+            start = (y + 1) * game_map.flags_width + 1
+            yield game_map.flags[start:start + width]
+        return
+    size = level.chunk_size
+    flags_by_tile = {}
+    for chunk_y in range(level.chunks_y):
+        chunks = [level.read_chunk(chunk_x, chunk_y)
+                  for chunk_x in range(level.chunks_x)]
+        for y in range(min(size, game_map.map_height - chunk_y * size)):
+            row = bytearray()
+            for tiles in chunks:
+                for tile_num in tiles[y * size:(y + 1) * size]:
+                    flags = flags_by_tile.get(tile_num)
+                    if flags is None:
+                        flags = flags_by_tile[tile_num] = get_tile_flags(
+                            tile_num)
+                    row.append(flags)
+            yield row[:width]
+
+#-------------------------------------------------------------------------------
+#    Function: get_stress_locations
+#
+# Description: Chooses spawn points for extra NPCs: places where a whole NPC
+#              fits in empty tiles and stands on solid ground, picked at
+#              random. Tiles are checked exactly, even on streamed maps.
+#
+#      Inputs: game  - A 'ToadsAdventure' instance with a level loaded.
+#              count - Number of extra NPCs.
+#              seed  - Seed making the choice repeatable.
+#
+#     Outputs: List of (ID, column, row) tuples, as in 'NPC_LOCATIONS'. Raises
+#              'ValueError' if the level has nowhere to put an NPC.
+#-------------------------------------------------------------------------------
+def get_stress_locations(game, count, seed):
+    span = CHARACTER_TILE_SIZE // MAP_TILE_SIZE # tiles per side of an NPC
+    blocking = TILE_SOLID | TILE_TOP_SOLID
+    rows = collections.deque(maxlen=span + 1) # an NPC's rows and the ground's
+    spawn_points = []
+    for (y, row) in enumerate(get_flag_rows(game.map)):
+        rows.append(row)
+        if len(rows) <= span:
+            continue
+        for x in range(len(row) - span + 1):
+            if (row[x] & blocking and
+                not any(rows[j][x + i] & blocking
+                        for j in range(span) for i in range(span))):
+                spawn_points.append((x + 1, y - span + 1))
+    if not spawn_points:
+        raise ValueError('level %d: no stress spawn points found' %
+                         game.current_level)
+    IDs = sorted(set(NPC[0] for locations in NPC_LOCATIONS
+                     for NPC in locations))
+    rng = random.Random(seed)
+    locations = []
+    for i in range(count):
+        (column, row) = rng.choice(spawn_points)
+        locations.append((rng.choice(IDs), column, row))
+    return locations
+
+#-------------------------------------------------------------------------------
+#    Function: get_percentiles
+#
+# Description: Computes percentiles of a list of durations.
+#
+#      Inputs: durations - List of durations, in seconds.
+#
+#     Outputs: Dictionary of p50/p95/p99 durations, in milliseconds.
+#-------------------------------------------------------------------------------
+def get_percentiles(durations):
+    durations = sorted(durations)
+    if not durations:
+        return {}
+    return dict(('p%d_ms' % p,
+                 durations[min(len(durations) - 1, len(durations) * p // 100)]
+                 * 1000.0) for p in (50, 95, 99))
+
+#-------------------------------------------------------------------------------
+#    Function: run_variant
+#
+# Description: Loads a level, optionally adds extra NPCs, then simulates and
+#              renders it with scripted input, timing each tick and frame.
+#
+#      Inputs: level         - Number of the level to run.
+#              extra_NPCs    - Number of NPCs to add to the level's own.
+#              num_frames    - Number of ticks to simulate.
+#              inputs        - Callable returning a fresh input iterator.
+#              use_npc_store - 'True' to use the NumPy NPC store.
+#              render        - 'True' to also render each tick offscreen.
+#
+#     Outputs: Dictionary of results.
+#-------------------------------------------------------------------------------
+def run_variant(level, extra_NPCs, num_frames, inputs, use_npc_store,
+                render=True):
+    game = toads_adventure.ToadsAdventure(level, MAP_TILES_FILENAME,
+                                          CHARACTER_TILES_FILENAME,
+                                          headless=True, offscreen=render,
+                                          use_npc_store=use_npc_store,
+                                          preload=False)
+    if extra_NPCs:
+        game.NPCs = game.create_NPCs(
+            NPC_LOCATIONS[level] +
+            get_stress_locations(game, extra_NPCs, BENCHMARK_SEED))
+    NPC_count = len(game.NPCs)
+    tick_times = []
+    paint_times = []
+    for (keys, new_keys) in itertools.islice(inputs(), num_frames):
+        start = perf_counter()
+        game.game_logic(keys, new_keys)
+        end = perf_counter()
+        tick_times.append(end - start)
+        if game.screen is not None:
+            game.paint(game.screen)
+            paint_times.append(perf_counter() - end)
+    result = {'level': level,
+              'variant': 'stress-%d' % extra_NPCs if extra_NPCs else 'base',
+              'npcs': NPC_count,
+              'ticks': len(tick_times),
+              'ticks_per_sec': len(tick_times) / max(sum(tick_times), 1e-9),
+              'tick': get_percentiles(tick_times)}
+    if paint_times:
+        result['render_fps'] = len(paint_times) / max(sum(paint_times), 1e-9)
+        result['frame'] = get_percentiles(paint_times)
+    return result
+
+#-------------------------------------------------------------------------------
+#    Function: measure_peak_memory
+#
+# Description: Repeats a variant under 'tracemalloc' (kept separate from the
+#              timed run, which it would slow down) to find the most memory
+#              allocated at once while loading and running it.
+#
+#      Inputs: Same as 'run_variant'.
+#
+#     Outputs: Peak traced memory, in bytes.
+#-------------------------------------------------------------------------------
+def measure_peak_memory(level, extra_NPCs, num_frames, inputs, use_npc_store,
+                        render=True):
+    tracemalloc.start()
+    try:
+        run_variant(level, extra_NPCs, num_frames, inputs, use_npc_store,
+                    render)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+#-------------------------------------------------------------------------------
+#    Function: run_benchmarks
+#
+# Description: Runs the base and stress variants of every level.
+#
+#      Inputs: levels        - Level numbers to run.
+#              stress        - Extra NPC counts for stress variants.
+#              num_frames    - Number of ticks to simulate per variant.
+#              inputs        - Callable returning a fresh input iterator.
+#              use_npc_store - 'True' to use the NumPy NPC store.
+#              render        - 'True' to also render offscreen.
+#              memory        - 'True' to also measure peak memory.
+#
+#     Outputs: Dictionary holding the environment and a list of results.
+#-------------------------------------------------------------------------------
+def run_benchmarks(levels, stress, num_frames, inputs=scripted_inputs,
+                   use_npc_store=False, render=True, memory=True):
+    report = {'python': platform.python_version(),
+              'pygame': pygame.version.ver,
+              'platform': platform.platform(),
+              'frames': num_frames,
+              'npc_store': use_npc_store,
+              'results': []}
+    for level in levels:
+        for extra_NPCs in (0,) + tuple(stress):
+            result = run_variant(level, extra_NPCs, num_frames, inputs,
+                                 use_npc_store, render)
+            if memory:
+                result['peak_memory_bytes'] = measure_peak_memory(
+                    level, extra_NPCs, num_frames, inputs, use_npc_store,
+                    render)
+            report['results'].append(result)
+            print('level %d %-12s %8.0f ticks/s' % (level, result['variant'],
+                                                    result['ticks_per_sec']),
+                  file=sys.stderr)
+    return report
+
+#-------------------------------------------------------------------------------
+#    Function: main
+#
+# Description: Runs the benchmarks and writes their results as JSON. Input
+#              recorded with 'toads_adventure.py --record' may be used in
+#              place of the scripted input.
+#
+#      Inputs: None, but options may be set via command line.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Toad's Adventure")
+    parser.add_argument('levels', type=int, nargs='*',
+                        default=list(range(1, NUM_LEVELS + 1)),
+                        help='levels to run (all by default)')
+    parser.add_argument('--frames', type=int, default=BENCHMARK_FRAMES,
+                        help='ticks to simulate per level and variant')
+    parser.add_argument('--stress', type=int, nargs='*',
+                        default=list(BENCHMARK_STRESS_NPCS), metavar='NPCS',
+                        help='extra NPC counts for stress variants')
+    parser.add_argument('--npc-store', action='store_true',
+                        default=USE_NPC_STORE,
+                        help='update NPCs with vectorized NumPy operations')
+    parser.add_argument('--no-render', action='store_true',
+                        help='skip offscreen rendering')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip peak memory measurement')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='drive every level with input recorded in FILE '
+                        'instead of the scripted input')
+    parser.add_argument('--output', metavar='FILE',
+                        help='write JSON to FILE instead of standard output')
+    args = parser.parse_args()
+    inputs = scripted_inputs
+    if args.replay:
+        recorded = input_file.load_inputs(args.replay)[3]
+        inputs = lambda: iter(recorded)
+    try:
+        report = run_benchmarks(args.levels, args.stress, args.frames, inputs,
+                                use_npc_store=args.npc_store,
+                                render=not args.no_render,
+                                memory=not args.no_memory)
+    except ValueError as error:
+        print(error)
+        sys.exit(-1)
+    if args.output:
+        with open(args.output, 'w') as fileOut:
+            json.dump(report, fileOut, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
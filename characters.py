@@ -7,12 +7,27 @@
 #-------------------------------------------------------------------------------
 
 import pygame
-from pygame import display
 import math
 import random
-import time
+import struct
+import weakref
+from operator import attrgetter
+import game_clock
 from config import *
 
+# mutable state shared by all game characters, in the order packed by
+# 'get_state' (static references like 'map' and 'tiles' are not included)
+CHARACTER_STATE_FIELDS = ('ID', 'x', 'y', 'prev_x', 'prev_y', 'dx', 'dy',
+                          'max_speed_x', 'max_speed_y', 'accel_rate',
+                          'first_tile', 'stances', 'width_offset',
+                          'height_offset', 'current_stance', 'pixels_moved',
+                          'num_stance_changes', 'facing_right', 'is_crouching',
+                          'is_climbing', 'is_flying')
+CHARACTER_STATE_FORMAT = '<h4i5d7i4?'
+
+# tables of sprites, built once per tileset (see 'get_sprite_tables')
+sprite_tables_by_tileset = weakref.WeakKeyDictionary()
+
 #-------------------------------------------------------------------------------
 #       Class: GameCharacter
 #
@@ -20,11 +35,17 @@ from config import *
 #              graphical rendering, etc.
 #
 #     Methods: __init__, draw, push_x, push_y, move_left, move_right,
-#              apply_friction, apply_gravity, jump, move, is_colliding,
-#              overlaps, will_fall, on_ground, on_ice, get_tile_number_behind,
-#              get_tile_number_below, round_up
+#              apply_friction, apply_gravity, jump, move, sweep, is_colliding,
+#              get_bounds, overlaps, will_fall, on_ground, on_ice,
+#              get_tile_number_behind, get_tile_number_below, get_flags_behind,
+#              get_flags_below, get_interpolated_position, round_up,
+#              get_state, set_state
 #-------------------------------------------------------------------------------
 class GameCharacter:
+    STATE_FIELDS = CHARACTER_STATE_FIELDS
+    STATE = struct.Struct(CHARACTER_STATE_FORMAT)
+    STATE_GETTER = attrgetter(*STATE_FIELDS)
+
     #---------------------------------------------------------------------------
     #      Method: __init__
     #
@@ -46,12 +67,15 @@ class GameCharacter:
     #              x             - Initial x-coordinate for upper-left pixel.
     #              y             - Initial y-coordinate for upper-left pixel.
     #              facing_right  - 'True' if character should be facing right.
+    #              rng           - Random number generator shared by the
+    #                              game's characters.
+    #              clock         - 'GameClock' measuring the game's time.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def __init__(self, ID, max_speed_x, max_speed_y, accel_rate, tiles,
                  first_tile, stances, width_offset, height_offset, map, screen,
-                 x, y, facing_right=True):
+                 x, y, facing_right=True, rng=None, clock=None):
         self.ID = ID
         self.max_speed_x = max_speed_x
         self.max_speed_y = max_speed_y
@@ -59,12 +83,15 @@ class GameCharacter:
         self.tiles = tiles
         self.first_tile = first_tile
         self.stances = stances
+        self.sprite_tables = get_sprite_tables(tiles)
         self.width_offset = width_offset
         self.height_offset = height_offset
         self.map = map
         self.screen = screen
         self.x = x
         self.y = y
+        self.prev_x = x # position before the latest move, for interpolation
+        self.prev_y = y
         self.facing_right = facing_right
         self.dx = 0.0 # horizontal velocity
         self.dy = 0.0 # vertical velocity
@@ -74,6 +101,12 @@ class GameCharacter:
         self.is_crouching = False
         self.is_climbing = False
         self.is_flying = False
+        if rng is None:
+            rng = random.Random()
+        if clock is None: # a clock nobody ticks: time stands still
+            clock = game_clock.GameClock(FRAMES_PER_SECOND)
+        self.rng = rng
+        self.clock = clock
 
     #---------------------------------------------------------------------------
     #      Method: push_x
@@ -202,6 +235,8 @@ class GameCharacter:
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def move(self):
+        (self.prev_x, self.prev_y) = (self.x, self.y)
+
         # get horizontal movement values
         abs_x = self.round_up(abs(self.dx))
         sign_x = 1
@@ -215,22 +250,16 @@ class GameCharacter:
             sign_y = -1
 
         # perform horizontal movement
-        pixel_count = 0
-        for x in range(int(abs_x)):
-            if self.is_colliding(self.x + sign_x, self.y):
-                self.dx = 0.0
-                break
-            else:
-                self.x += sign_x
-                pixel_count += 1
+        pixel_count = self.sweep(abs_x, sign_x, True)
+        if pixel_count < abs_x:
+            self.dx = 0.0
+        self.x += sign_x * pixel_count
 
         # perform vertical movement
-        for y in range(int(abs_y)):
-            if self.is_colliding(self.x, self.y + sign_y):
-                self.dy = 0.0
-                break
-            else:
-                self.y += sign_y
+        distance_y = self.sweep(abs_y, sign_y, False)
+        if distance_y < abs_y:
+            self.dy = 0.0
+        self.y += sign_y * distance_y
 
         # adjust character's stance as appropriate
         if self.stances > 1:
@@ -244,7 +273,7 @@ class GameCharacter:
                         self.current_stance = 0
                         self.num_stance_changes = 0
                     # handle ninji jump behavior here
-                    if self.ID == NINJI and int(time.time()) % 2:
+                    if self.ID == NINJI and int(self.clock.get_time()) % 2:
                         self.jump()
                 else:
                     self.current_stance -= 1
@@ -262,6 +291,83 @@ class GameCharacter:
                 elif self.ID == NINJI:
                     self.current_stance = 1
 
+    #---------------------------------------------------------------------------
+    #      Method: sweep
+    #
+    # Description: Determines how far the character can move along one axis
+    #              before 'is_colliding' would report a collision, visiting
+    #              only the tiles crossed by its collision probes rather than
+    #              testing every pixel along the way.
+    #
+    #      Inputs: distance   - Maximum number of pixels to move.
+    #              sign       - Direction of movement: 1 or -1.
+    #              horizontal - 'True' to move along the x-axis, 'False' for the
+    #                           y-axis.
+    #
+    #     Outputs: Number of pixels the character can move (0 to 'distance').
+    #---------------------------------------------------------------------------
+    def sweep(self, distance, sign, horizontal):
+        if distance <= 0:
+            return 0
+        left = self.x + self.width_offset
+        right = self.x + (CHARACTER_TILE_SIZE - 1) - self.width_offset
+        top = self.y + self.height_offset
+        bottom = self.y + (CHARACTER_TILE_SIZE - 1)
+        mid_x = self.x + CHARACTER_TILE_SIZE // 2
+        mid_y = self.y + CHARACTER_TILE_SIZE // 2
+        foot_mask = TILE_SOLID
+        if self.dy >= 0:
+            foot_mask |= TILE_TOP_SOLID
+
+        # each probe: (moving pixel coordinate, [(fixed tile coordinate,
+        # blocking flags), ...]), matching the points tested by 'is_colliding'
+        if horizontal:
+            edge_rows = [(top // MAP_TILE_SIZE, TILE_SOLID),
+                         (mid_y // MAP_TILE_SIZE, TILE_SOLID),
+                         (bottom // MAP_TILE_SIZE, foot_mask)]
+            probes = [(left, edge_rows), (right, edge_rows),
+                      (mid_x, [(top // MAP_TILE_SIZE, TILE_SOLID),
+                               (bottom // MAP_TILE_SIZE, TILE_SOLID)])]
+        else:
+            (left_col, right_col, mid_col) = (left // MAP_TILE_SIZE,
+                                              right // MAP_TILE_SIZE,
+                                              mid_x // MAP_TILE_SIZE)
+            probes = [(top, [(left_col, TILE_SOLID), (right_col, TILE_SOLID),
+                             (mid_col, TILE_SOLID)]),
+                      (mid_y, [(left_col, TILE_SOLID),
+                               (right_col, TILE_SOLID)]),
+                      (bottom, [(left_col, foot_mask), (right_col, foot_mask),
+                                (mid_col, TILE_SOLID)])]
+
+        # find the first step (1 to 'distance') at which any probe enters a
+        # blocking tile
+        get_flags = self.map.get_flags
+        blocked_step = distance + 1
+        for (start, cells) in probes:
+            first_tile = (start + sign) // MAP_TILE_SIZE
+            last_tile = (start + sign * distance) // MAP_TILE_SIZE
+            for tile in range(first_tile, last_tile + sign, sign):
+                if sign > 0:
+                    step = tile * MAP_TILE_SIZE - start
+                else:
+                    step = start - (tile * MAP_TILE_SIZE + MAP_TILE_SIZE - 1)
+                if step < 1:
+                    step = 1
+                if step >= blocked_step:
+                    break
+                for (fixed, mask) in cells:
+                    if horizontal:
+                        flags = get_flags(tile, fixed)
+                    else:
+                        flags = get_flags(fixed, tile)
+                    if flags & mask:
+                        blocked_step = step
+                        break
+                else:
+                    continue
+                break
+        return blocked_step - 1
+
     #---------------------------------------------------------------------------
     #      Method: is_colliding
     #
@@ -285,22 +391,36 @@ class GameCharacter:
         mid_x = x + CHARACTER_TILE_SIZE // 2
         mid_y = y + CHARACTER_TILE_SIZE // 2
 
-        if (self.map.is_solid_at(left, top) or
-            self.map.is_solid_at(right, top) or
-            self.map.is_solid_at(left, bottom) or
-            self.map.is_solid_at(right, bottom) or
-            self.map.is_solid_at(left, mid_y) or
-            self.map.is_solid_at(right, mid_y) or
-            self.map.is_solid_at(mid_x, top) or
-            self.map.is_solid_at(mid_x, bottom)):
+        flags_at = self.map.get_flags_at
+        if ((flags_at(left, top) | flags_at(right, top) |
+             flags_at(left, bottom) | flags_at(right, bottom) |
+             flags_at(left, mid_y) | flags_at(right, mid_y) |
+             flags_at(mid_x, top) | flags_at(mid_x, bottom)) & TILE_SOLID):
             return True
         elif (self.dy >= 0 and
-              (self.map.get_tile_number_at(left, bottom) in TOP_SOLID_TILES or
-               self.map.get_tile_number_at(right, bottom) in TOP_SOLID_TILES)):
+              (flags_at(left, bottom) | flags_at(right, bottom)) &
+              TILE_TOP_SOLID):
             return True
 
         return False
 
+    #---------------------------------------------------------------------------
+    #      Method: get_bounds
+    #
+    # Description: Returns the character's bounding box, excluding the empty
+    #              pixels around it in its tile images.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: A tuple containing the (left, top, right, bottom) pixel
+    #              coordinates, inclusive.
+    #---------------------------------------------------------------------------
+    def get_bounds(self):
+        return (self.x + self.width_offset,
+                self.y + self.height_offset,
+                self.x + (CHARACTER_TILE_SIZE - 1) - self.width_offset,
+                self.y + (CHARACTER_TILE_SIZE - 1))
+
     #---------------------------------------------------------------------------
     #      Method: overlaps
     #
@@ -338,9 +458,11 @@ class GameCharacter:
         left = self.x
         right = self.x + CHARACTER_TILE_SIZE + 1 # - self.width_offset
         bottom = self.y + CHARACTER_TILE_SIZE + 1
-        return self.on_ground() and (
-            (self.facing_right and self.map.is_non_solid_at(right, bottom)) or
-            (not self.facing_right and self.map.is_non_solid_at(left, bottom)))
+        if self.facing_right:
+            edge_flags = self.map.get_flags_at(right, bottom)
+        else:
+            edge_flags = self.map.get_flags_at(left, bottom)
+        return (edge_flags & TILE_NON_SOLID) != 0 and self.on_ground()
 
     #---------------------------------------------------------------------------
     #      Method: on_ground
@@ -364,7 +486,7 @@ class GameCharacter:
     #     Outputs: 'True' if character's feet are directly above an icy tile.
     #---------------------------------------------------------------------------
     def on_ice(self):
-        return self.get_tile_number_below() in ICY_TILES
+        return (self.get_flags_below() & TILE_ICY) != 0
 
     #---------------------------------------------------------------------------
     #      Method: get_tile_number_behind
@@ -395,6 +517,50 @@ class GameCharacter:
         return self.map.get_tile_number_at(self.x + CHARACTER_TILE_SIZE // 2,
                                            self.y + CHARACTER_TILE_SIZE + 1)
 
+    #---------------------------------------------------------------------------
+    #      Method: get_flags_behind
+    #
+    # Description: Returns the flag bits (see 'Map.get_flags') of the map tile
+    #              directly behind the character.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: Flag bits of map tile behind the character.
+    #---------------------------------------------------------------------------
+    def get_flags_behind(self):
+        return self.map.get_flags_at(self.x + CHARACTER_TILE_SIZE // 2,
+                                     self.y + CHARACTER_TILE_SIZE - 1)
+
+    #---------------------------------------------------------------------------
+    #      Method: get_flags_below
+    #
+    # Description: Returns the flag bits (see 'Map.get_flags') of the map tile
+    #              directly below the character.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: Flag bits of map tile underneath the character.
+    #---------------------------------------------------------------------------
+    def get_flags_below(self):
+        return self.map.get_flags_at(self.x + CHARACTER_TILE_SIZE // 2,
+                                     self.y + CHARACTER_TILE_SIZE + 1)
+
+    #---------------------------------------------------------------------------
+    #      Method: get_interpolated_position
+    #
+    # Description: Returns a position between the character's location before
+    #              and after its latest move, for smooth rendering between
+    #              game logic ticks.
+    #
+    #      Inputs: alpha - Fraction of the way from the previous position to
+    #                      the current one (0.0 to 1.0).
+    #
+    #     Outputs: A tuple containing integer (x, y) pixel coordinates.
+    #---------------------------------------------------------------------------
+    def get_interpolated_position(self, alpha):
+        return (int(round(self.prev_x + (self.x - self.prev_x) * alpha)),
+                int(round(self.prev_y + (self.y - self.prev_y) * alpha)))
+
     #---------------------------------------------------------------------------
     #      Method: round_up
     #
@@ -409,16 +575,49 @@ class GameCharacter:
         return ((int(math.ceil(n)) + (MIN_PIXELS_PER_FRAME - 1)) //
                 MIN_PIXELS_PER_FRAME) * MIN_PIXELS_PER_FRAME
 
+    #---------------------------------------------------------------------------
+    #      Method: get_state
+    #
+    # Description: Packs the character's mutable state into bytes.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: A bytes object of 'STATE.size' bytes.
+    #---------------------------------------------------------------------------
+    def get_state(self):
+        return self.STATE.pack(*self.STATE_GETTER(self))
+
+    #---------------------------------------------------------------------------
+    #      Method: set_state
+    #
+    # Description: Restores mutable state packed by 'get_state'.
+    #
+    #      Inputs: data   - Bytes-like object holding the state.
+    #              offset - Index of the state's first byte within 'data'.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def set_state(self, data, offset=0):
+        self.__dict__.update(zip(self.STATE_FIELDS,
+                                 self.STATE.unpack_from(data, offset)))
+
 #-------------------------------------------------------------------------------
 #       Class: PlayerCharacter
 #
 # Description: Represents the player character.
 #
-#     Methods: __init__, game_logic, draw, is_big, is_small, grow, shrink,
-#              is_invincible, climb, climb_up, climb_down, can_climb,
-#              take_damage, pose_and_pause, victory_pose, die
+#     Methods: __init__, game_logic, get_sprite, draw, is_big, is_small, grow,
+#              shrink, is_invincible, climb, climb_up, climb_down, can_climb,
+#              take_damage, pose_and_pause, is_posing, update_pose,
+#              victory_pose, die, respawn, get_state, set_state
 #-------------------------------------------------------------------------------
 class PlayerCharacter(GameCharacter):
+    STATE_FIELDS = CHARACTER_STATE_FIELDS + ('invincibility_timer',
+                                             'climbing_stance', 'pose_timer',
+                                             'is_dead', 'pose')
+    STATE = struct.Struct(CHARACTER_STATE_FORMAT + '3i?i')
+    STATE_GETTER = attrgetter(*STATE_FIELDS)
+
     #---------------------------------------------------------------------------
     #      Method: __init__
     #
@@ -429,17 +628,23 @@ class PlayerCharacter(GameCharacter):
     #              screen - The screen on which the game is displayed.
     #              x      - Initial x-coordinate for upper-left pixel.
     #              y      - Initial y-coordinate for upper-left pixel.
+    #              rng    - Random number generator shared by the game's
+    #                       characters.
+    #              clock  - 'GameClock' measuring the game's time.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
-    def __init__(self, tiles, map, screen, x, y):
+    def __init__(self, tiles, map, screen, x, y, rng=None, clock=None):
         GameCharacter.__init__(self, PLAYER, PLAYER_MAX_SPEED_X,
                                PLAYER_MAX_SPEED_Y, PLAYER_ACCEL_RATE, tiles,
                                FIRST_PLAYER_TILE_BIG, PLAYER_STANCES,
                                PLAYER_WIDTH_OFFSET, PLAYER_HEIGHT_OFFSET_BIG,
-                               map, screen, x, y)
+                               map, screen, x, y, rng=rng, clock=clock)
         self.invincibility_timer = 0
         self.climbing_stance = 0
+        self.pose = None # tile number of current pose, if any
+        self.pose_timer = 0 # game cycles left in current pose
+        self.is_dead = False
 
     #---------------------------------------------------------------------------
     #      Method: game_logic
@@ -454,11 +659,13 @@ class PlayerCharacter(GameCharacter):
     #---------------------------------------------------------------------------
     def game_logic(self, keys, new_keys):
         # check for damage and death
-        if self.get_tile_number_below() == SPIKE_TILE:
+        if self.get_flags_below() & TILE_HAZARD:
             self.take_damage()
         elif self.y + self.height_offset > (self.map.map_height *
                                             MAP_TILE_SIZE):
             self.die()
+        if self.is_posing():
+            return
 
         # check invincibility timer
         if self.invincibility_timer > 0:
@@ -506,6 +713,33 @@ class PlayerCharacter(GameCharacter):
         # apply motion
         self.move()
 
+    #---------------------------------------------------------------------------
+    #      Method: get_sprite
+    #
+    # Description: Determines what 'draw' would blit for the player character.
+    #
+    #      Inputs: position - Tuple containing (x, y) pixel coordinates.
+    #
+    #     Outputs: A tuple containing the surface to blit and its position (or
+    #              'None' if nothing is drawn).
+    #---------------------------------------------------------------------------
+    def get_sprite(self, position):
+        if self.is_posing():
+            return self.tiles.get_sprite(self.pose, position)
+        elif self.invincibility_timer % 2: # flicker effect
+            return None
+        (walking, climbing, crouching) = \
+            self.sprite_tables[PLAYER][self.first_tile]
+        if self.is_climbing:
+            frame = climbing[self.climbing_stance]
+        elif self.is_crouching:
+            frame = crouching
+        else:
+            frame = walking[self.facing_right][self.current_stance]
+        if frame is None:
+            return None
+        return (frame[0], (position[0] + frame[1], position[1] + frame[2]))
+
     #---------------------------------------------------------------------------
     #      Method: draw
     #
@@ -516,35 +750,9 @@ class PlayerCharacter(GameCharacter):
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def draw(self, position):
-        if self.is_invincible() and random.randint(0, 1): # flicker effect
-            return
-        elif self.is_climbing:
-            if self.is_big():
-                self.screen.blit(self.tiles.get_image(
-                                     FIRST_CLIMBING_TILE_BIG +
-                                     self.climbing_stance),
-                                 position)
-            else:
-                self.screen.blit(self.tiles.get_image(
-                                     FIRST_CLIMBING_TILE_SMALL +
-                                     self.climbing_stance),
-                                 position)
-        elif self.is_crouching:
-            if self.is_big():
-                self.screen.blit(self.tiles.get_image(CROUCHING_TILE_BIG),
-                                 position)
-            else:
-                self.screen.blit(self.tiles.get_image(CROUCHING_TILE_SMALL),
-                                 position)
-        elif self.facing_right:
-            self.screen.blit(self.tiles.get_image(self.first_tile +
-                                                  self.current_stance),
-                             position)
-        else: # facing left
-            self.screen.blit(self.tiles.get_image(self.first_tile +
-                                                  self.stances +
-                                                  self.current_stance),
-                             position)
+        sprite = self.get_sprite(position)
+        if sprite is not None:
+            self.screen.blit(*sprite)
 
     #---------------------------------------------------------------------------
     #      Method: is_big
@@ -625,9 +833,9 @@ class PlayerCharacter(GameCharacter):
             self.dx = 0.0
             self.dy = 0.0
         self.dy = PLAYER_CLIMB_RATE * direction
-        if random.randint(0, 8) == 0:
+        if self.rng.randint(0, 8) == 0:
             self.climbing_stance += 1
-            if self.climbing_stance > 1:
+            if self.climbing_stance >= PLAYER_CLIMBING_STANCES:
                 self.climbing_stance = 0
 
     #---------------------------------------------------------------------------
@@ -665,7 +873,7 @@ class PlayerCharacter(GameCharacter):
     #     Outputs: 'True' if Toad can climb, 'False' otherwise.
     #---------------------------------------------------------------------------
     def can_climb(self):
-        return self.get_tile_number_behind() in CLIMBABLE_TILES
+        return (self.get_flags_behind() & TILE_CLIMBABLE) != 0
 
     #---------------------------------------------------------------------------
     #      Method: take_damage
@@ -678,7 +886,7 @@ class PlayerCharacter(GameCharacter):
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def take_damage(self):
-        if not self.is_invincible():
+        if not self.is_invincible() and not self.is_posing():
             if self.is_small():
                 self.die()
             else:
@@ -688,8 +896,10 @@ class PlayerCharacter(GameCharacter):
     #---------------------------------------------------------------------------
     #      Method: pose_and_pause
     #
-    # Description: Displays Toad in a given pose for a given number of seconds
-    #              (during which everything will be paused).
+    # Description: Starts displaying Toad in a given pose for a given number of
+    #              seconds, during which the rest of the game is paused. The
+    #              pose is counted down in game cycles by 'update_pose', so
+    #              nothing blocks in the meantime.
     #
     #      Inputs: pose  - Tile number of desired pose.
     #              pause - Pause duration, in seconds.
@@ -697,17 +907,42 @@ class PlayerCharacter(GameCharacter):
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def pose_and_pause(self, pose, pause):
-        # draw map again to erase player's previous tile
-        x = self.x - (self.map.screen_width // 2)
-        y = self.y - (self.map.screen_height // 2)
-        self.map.draw(x, y)
+        self.pose = pose
+        self.pose_timer = int(round(pause * self.clock.fps))
+        (self.prev_x, self.prev_y) = (self.x, self.y) # hold still
+
+    #---------------------------------------------------------------------------
+    #      Method: is_posing
+    #
+    # Description: Determines whether Toad is currently holding a pose.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: 'True' if a pose is in progress.
+    #---------------------------------------------------------------------------
+    def is_posing(self):
+        return self.pose is not None
 
-        # draw desired pose, then pause the game
-        position = (self.map.screen_width // 2 - MAP_TILE_SIZE,
-                    self.map.screen_height // 2 - MAP_TILE_SIZE)
-        self.screen.blit(self.tiles.get_image(pose), position)
-        display.flip()
-        time.sleep(pause)
+    #---------------------------------------------------------------------------
+    #      Method: update_pose
+    #
+    # Description: Counts down the current pose by one game cycle. When a death
+    #              pose ends, Toad respawns.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: 'True' if the pose ended during this cycle.
+    #---------------------------------------------------------------------------
+    def update_pose(self):
+        if not self.is_posing():
+            return False
+        self.pose_timer -= 1
+        if self.pose_timer > 0:
+            return False
+        self.pose = None
+        if self.is_dead:
+            self.respawn()
+        return True
 
     #---------------------------------------------------------------------------
     #      Method: victory_pose
@@ -731,27 +966,76 @@ class PlayerCharacter(GameCharacter):
     #---------------------------------------------------------------------------
     #      Method: die
     #
-    # Description: Handles Toad's death and respawns him at starting point.
+    # Description: Handles Toad's death. He'll respawn at the starting point
+    #              once his death pose ends.
     #
     #      Inputs: None.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def die(self):
-        self.pose_and_pause(PLAYER_DEAD_TILE, 1)
+        if not self.is_posing():
+            self.is_dead = True
+            self.pose_and_pause(PLAYER_DEAD_TILE, 1)
+
+    #---------------------------------------------------------------------------
+    #      Method: respawn
+    #
+    # Description: Brings Toad back to life at the starting point.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def respawn(self):
+        self.is_dead = False
         self.grow()
         self.facing_right = True
         (self.x, self.y) = self.map.player_start_location
+        (self.prev_x, self.prev_y) = (self.x, self.y)
         (self.dx, self.dy) = (0, 0)
 
+    #---------------------------------------------------------------------------
+    #      Method: get_state
+    #
+    # Description: Packs Toad's mutable state into bytes. A missing pose is
+    #              stored as -1.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: A bytes object of 'STATE.size' bytes.
+    #---------------------------------------------------------------------------
+    def get_state(self):
+        pose = -1 if self.pose is None else self.pose
+        return self.STATE.pack(*self.STATE_GETTER(self)[:-1], pose)
+
+    #---------------------------------------------------------------------------
+    #      Method: set_state
+    #
+    # Description: Restores mutable state packed by 'get_state'.
+    #
+    #      Inputs: data   - Bytes-like object holding the state.
+    #              offset - Index of the state's first byte within 'data'.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def set_state(self, data, offset=0):
+        GameCharacter.set_state(self, data, offset)
+        if self.pose < 0:
+            self.pose = None
+
 #-------------------------------------------------------------------------------
 #       Class: NonPlayerCharacter
 #
 # Description: Represents an NPC.
 #
-#     Methods: __init__, game_logic, draw
+#     Methods: __init__, game_logic, turn_around, bump, get_sprite, draw
 #-------------------------------------------------------------------------------
 class NonPlayerCharacter(GameCharacter):
+    STATE_FIELDS = CHARACTER_STATE_FIELDS + ('is_active',)
+    STATE = struct.Struct(CHARACTER_STATE_FORMAT + '?')
+    STATE_GETTER = attrgetter(*STATE_FIELDS)
+
     #---------------------------------------------------------------------------
     #      Method: __init__
     #
@@ -764,30 +1048,30 @@ class NonPlayerCharacter(GameCharacter):
     #              x            - Initial x-coordinate for upper-left pixel.
     #              y            - Initial y-coordinate for upper-left pixel.
     #              facing_right - 'True' if character should be facing right.
+    #              rng          - Random number generator shared by the game's
+    #                             characters.
+    #              clock        - 'GameClock' measuring the game's time.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
-    def __init__(self, ID, tiles, map, screen, x, y, facing_right=False):
+    def __init__(self, ID, tiles, map, screen, x, y, facing_right=False,
+                 rng=None, clock=None):
         max_speed_x = DEFAULT_NPC_MAX_SPEED_X
         max_speed_y = DEFAULT_NPC_MAX_SPEED_Y
         accel_rate = DEFAULT_NPC_ACCEL_RATE
         width_offset = DEFAULT_WIDTH_OFFSET
         height_offset = DEFAULT_HEIGHT_OFFSET
         first_tile = NPC_FIRST_TILES[ID]
-        stances = DEFAULT_STANCES
-        if ID == SPARK:
-            stances = SPARK_STANCES
-        elif ID == ALBATOSS:
-            stances = ALBATOSS_STANCES
-        elif ID == PHANTO:
-            stances = PHANTO_STANCES
-        elif ID == FLURRY:
+        stances = get_NPC_stances(ID)
+        if ID == FLURRY:
             max_speed_x *= 1.5
         GameCharacter.__init__(self, ID, max_speed_x, max_speed_y, accel_rate,
                                tiles, first_tile, stances, width_offset,
-                               height_offset, map, screen, x, y, facing_right)
+                               height_offset, map, screen, x, y, facing_right,
+                               rng, clock)
         if ID == SPARK or ID == ALBATOSS or ID == PHANTO:
             self.is_flying = True
+        self.is_active = False # only active NPCs run their game logic
 
     #---------------------------------------------------------------------------
     #      Method: game_logic
@@ -811,8 +1095,7 @@ class NonPlayerCharacter(GameCharacter):
                                   self.width_offset * 2 >=
                                   self.map.get_size()[0] * MAP_TILE_SIZE)))   or
             (self.ID == SHY_GUY_BLUE and self.will_fall())):
-            self.facing_right = not self.facing_right
-            self.dx *= -1.0
+            self.turn_around()
 
         # horizontal acceleration
         self.apply_friction()
@@ -827,6 +1110,61 @@ class NonPlayerCharacter(GameCharacter):
         # apply motion
         self.move()
 
+    #---------------------------------------------------------------------------
+    #      Method: turn_around
+    #
+    # Description: Reverses the NPC's orientation and horizontal velocity.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def turn_around(self):
+        self.facing_right = not self.facing_right
+        self.dx *= -1.0
+
+    #---------------------------------------------------------------------------
+    #      Method: bump
+    #
+    # Description: Handles contact with another NPC: a walking NPC heading
+    #              toward the other one turns around.
+    #
+    #      Inputs: other - The NPC that has been bumped into.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def bump(self, other):
+        if self.is_flying or other.is_flying:
+            return
+        if ((self.facing_right and other.x > self.x) or
+            (not self.facing_right and other.x < self.x)):
+            self.turn_around()
+
+    #---------------------------------------------------------------------------
+    #      Method: get_sprite
+    #
+    # Description: Determines what 'draw' would blit for the NPC.
+    #
+    #      Inputs: map_x - Left-most map pixel currently displayed.
+    #              map_y - Top-most map pixel currently displayed.
+    #              alpha - Fraction of a tick elapsed since the latest move,
+    #                      for interpolation (0.0 to 1.0).
+    #
+    #     Outputs: A tuple containing the surface to blit and its position (or
+    #              'None' if the NPC isn't currently visible).
+    #---------------------------------------------------------------------------
+    def get_sprite(self, map_x, map_y, alpha=1.0):
+        (x, y) = self.get_interpolated_position(alpha)
+        if (x < map_x or x > (map_x + self.map.screen_width) or
+            y < map_y or y > (map_y + self.map.screen_height)):
+            return None
+        frame = self.sprite_tables[self.ID][self.facing_right][
+            self.current_stance]
+        if frame is None:
+            return None
+        return (frame[0], (x - map_x - MAP_TILE_SIZE + frame[1],
+                           y - map_y - MAP_TILE_SIZE + frame[2]))
+
     #---------------------------------------------------------------------------
     #      Method: draw
     #
@@ -834,21 +1172,94 @@ class NonPlayerCharacter(GameCharacter):
     #
     #      Inputs: map_x - Left-most map pixel currently displayed.
     #              map_y - Top-most map pixel currently displayed.
+    #              alpha - Fraction of a tick elapsed since the latest move,
+    #                      for interpolation (0.0 to 1.0).
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
-    def draw(self, map_x, map_y):
-        if (self.x < map_x or self.x > (map_x + self.map.screen_width) or
-            self.y < map_y or self.y > (map_y + self.map.screen_height)):
-            return
-        position = (self.x - map_x - MAP_TILE_SIZE,
-                    self.y - map_y - MAP_TILE_SIZE)
-        if self.ID == SPARK or self.facing_right:
-            self.screen.blit(self.tiles.get_image(self.first_tile +
-                                                  self.current_stance),
-                             position)
-        else: # facing left
-            self.screen.blit(self.tiles.get_image(self.first_tile +
-                                                  self.stances +
-                                                  self.current_stance),
-                             position)
+    def draw(self, map_x, map_y, alpha=1.0):
+        sprite = self.get_sprite(map_x, map_y, alpha)
+        if sprite is not None:
+            self.screen.blit(*sprite)
+
+#-------------------------------------------------------------------------------
+#    Function: get_NPC_stances
+#
+# Description: Determines how many movement stances an NPC type has.
+#
+#      Inputs: ID - NPC type (e.g., SHY_GUY_RED).
+#
+#     Outputs: Number of stances in each direction.
+#-------------------------------------------------------------------------------
+def get_NPC_stances(ID):
+    if ID == SPARK:
+        return SPARK_STANCES
+    if ID == ALBATOSS:
+        return ALBATOSS_STANCES
+    if ID == PHANTO:
+        return PHANTO_STANCES
+    return DEFAULT_STANCES
+
+#-------------------------------------------------------------------------------
+#    Function: get_sprite_tables
+#
+# Description: Returns the sprite tables for a tileset, building them on first
+#              use (see 'build_sprite_tables').
+#
+#      Inputs: tiles - Tileset used by all game characters.
+#
+#     Outputs: List of sprite tables, indexed by character type.
+#-------------------------------------------------------------------------------
+def get_sprite_tables(tiles):
+    tables = sprite_tables_by_tileset.get(tiles)
+    if tables is None:
+        tables = sprite_tables_by_tileset[tiles] = build_sprite_tables(tiles)
+    return tables
+
+#-------------------------------------------------------------------------------
+#    Function: build_sprite_tables
+#
+# Description: Looks up, for every character type, each sprite it may be
+#              drawn with, so drawing takes no tile arithmetic or bounds
+#              checks. Each sprite is an (image, x offset, y offset) tuple
+#              ('None' for a blank tile). An NPC type's table is indexed as
+#              [facing_right][current_stance]; the player's maps 'first_tile'
+#              (big or small) to a tuple of a walking table (as for NPCs), a
+#              climbing table (indexed by 'climbing_stance'), and a crouching
+#              sprite.
+#
+#      Inputs: tiles - Tileset used by all game characters.
+#
+#     Outputs: List of sprite tables, indexed by character type.
+#-------------------------------------------------------------------------------
+def build_sprite_tables(tiles):
+    def get_frame(tile_num):
+        sprite = tiles.get_sprite(tile_num, (0, 0))
+        if sprite is None:
+            return None
+        return (sprite[0], sprite[1][0], sprite[1][1])
+
+    def get_walking_frames(first_tile, stances, is_symmetric=False):
+        right = tuple([get_frame(first_tile + stance)
+                       for stance in range(max(stances, 1))])
+        if is_symmetric:
+            return (right, right)
+        left = tuple([get_frame(first_tile + stances + stance)
+                      for stance in range(max(stances, 1))])
+        return (left, right) # indexed by 'facing_right'
+
+    tables = [None] * NUM_GAME_CHARACTER_TYPES
+    tables[PLAYER] = {}
+    for (first_tile, first_climbing_tile, crouching_tile) in (
+        (FIRST_PLAYER_TILE_BIG, FIRST_CLIMBING_TILE_BIG, CROUCHING_TILE_BIG),
+        (FIRST_PLAYER_TILE_SMALL, FIRST_CLIMBING_TILE_SMALL,
+         CROUCHING_TILE_SMALL)):
+        tables[PLAYER][first_tile] = (
+            get_walking_frames(first_tile, PLAYER_STANCES),
+            tuple([get_frame(first_climbing_tile + stance)
+                   for stance in range(PLAYER_CLIMBING_STANCES)]),
+            get_frame(crouching_tile))
+    for ID in range(PLAYER + 1, NUM_GAME_CHARACTER_TYPES):
+        tables[ID] = get_walking_frames(NPC_FIRST_TILES[ID],
+                                        get_NPC_stances(ID), ID == SPARK)
+    return tables
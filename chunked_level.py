@@ -0,0 +1,211 @@
+#-------------------------------------------------------------------------------
+#    Filename: chunked_level.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Reads and writes the chunked level format ('.lvc'), used for
+#              levels too large to keep entirely in memory. After a 16-byte
+#              header come a coarse solidity summary of the whole level, an
+#              index of chunks, and the chunks themselves: square blocks of
+#              tile numbers (as in 'level_file.py'), each compressed with zlib
+#              so any one of them may be read and decoded on its own.
+#-------------------------------------------------------------------------------
+
+import array
+import mmap
+import struct
+import sys
+import zlib
+import level_file
+from config import TILE_SOLID, TILE_TOP_SOLID, TILE_NON_SOLID
+
+CHUNKED_LEVEL_MAGIC = b'TOAC'
+CHUNKED_LEVEL_VERSION = 1
+CHUNKED_LEVEL_HEADER = struct.Struct('<4sHHHHHxx') # magic, version, w, h,
+                                                   # chunk and coarse sizes
+CHUNKED_LEVEL_INDEX_FORMAT = 'I' # offset and length of each chunk
+COARSE_FLAGS = TILE_SOLID | TILE_TOP_SOLID # kept in the solidity summary
+
+#-------------------------------------------------------------------------------
+#       Class: ChunkedLevel
+#
+# Description: A memory-mapped chunked level file. Only its header, index, and
+#              solidity summary are read up front; chunks are decoded on
+#              request, from any thread.
+#
+#     Methods: __init__, get_num_chunks, read_chunk, get_coarse_flags
+#-------------------------------------------------------------------------------
+class ChunkedLevel:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Opens a chunked level file and validates its layout.
+    #
+    #      Inputs: filename - Name of a chunked level file.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fileIn:
+            self.data = mmap.mmap(fileIn.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < CHUNKED_LEVEL_HEADER.size:
+            raise ValueError('%s is too small to be a chunked level file' %
+                             filename)
+        (magic, version, self.width, self.height, self.chunk_size,
+         self.coarse_size) = CHUNKED_LEVEL_HEADER.unpack_from(self.data)
+        if magic != CHUNKED_LEVEL_MAGIC:
+            raise ValueError('%s is not a chunked level file' % filename)
+        if version != CHUNKED_LEVEL_VERSION:
+            raise ValueError('%s has unsupported version %d' % (filename,
+                                                                 version))
+        if not self.chunk_size or not self.coarse_size:
+            raise ValueError('%s has a chunk size of 0' % filename)
+        (self.chunks_x, self.chunks_y) = self.get_num_chunks(self.chunk_size)
+        (self.coarse_width, coarse_height) = self.get_num_chunks(
+            self.coarse_size)
+
+        start = CHUNKED_LEVEL_HEADER.size
+        end = start + self.coarse_width * coarse_height
+        self.index = array.array(CHUNKED_LEVEL_INDEX_FORMAT)
+        index_end = end + (self.chunks_x * self.chunks_y * 2 *
+                           self.index.itemsize)
+        if len(self.data) < index_end:
+            raise ValueError('%s is truncated' % filename)
+        self.coarse = self.data[start:end]
+        self.index.frombytes(self.data[end:index_end])
+        if sys.byteorder != 'little':
+            self.index.byteswap()
+
+    #---------------------------------------------------------------------------
+    #      Method: get_num_chunks
+    #
+    # Description: Counts the square blocks of a given size covering the level.
+    #
+    #      Inputs: size - Tiles per side of each block.
+    #
+    #     Outputs: A tuple containing the number of columns and rows of blocks.
+    #---------------------------------------------------------------------------
+    def get_num_chunks(self, size):
+        return (-(-self.width // size), -(-self.height // size))
+
+    #---------------------------------------------------------------------------
+    #      Method: read_chunk
+    #
+    # Description: Decodes one chunk. Cells of chunks along the right and
+    #              bottom edges that lie beyond the level hold -1.
+    #
+    #      Inputs: chunk_x - Horizontal coordinate, measured in chunks.
+    #              chunk_y - Vertical coordinate, measured in chunks.
+    #
+    #     Outputs: An array of 'chunk_size * chunk_size' tile numbers (indexed
+    #              as 'y * chunk_size + x').
+    #---------------------------------------------------------------------------
+    def read_chunk(self, chunk_x, chunk_y):
+        i = (chunk_y * self.chunks_x + chunk_x) * 2
+        (offset, length) = (self.index[i], self.index[i + 1])
+        try:
+            raw = zlib.decompress(self.data[offset:offset + length])
+        except zlib.error as error:
+            raise ValueError('%s: chunk (%d, %d) is damaged: %s' %
+                             (self.filename, chunk_x, chunk_y, error))
+        if len(raw) != self.chunk_size * self.chunk_size * 2:
+            raise ValueError('%s: chunk (%d, %d) is the wrong size' %
+                             (self.filename, chunk_x, chunk_y))
+        tiles = array.array(level_file.LEVEL_FILE_TILE_FORMAT, raw)
+        if sys.byteorder != 'little':
+            tiles.byteswap()
+        return tiles
+
+    #---------------------------------------------------------------------------
+    #      Method: get_coarse_flags
+    #
+    # Description: Looks up the solidity summary of the block of
+    #              'coarse_size x coarse_size' tiles containing a cell. The
+    #              block is TILE_SOLID and/or TILE_TOP_SOLID if any of its
+    #              tiles are, otherwise TILE_NON_SOLID.
+    #
+    #      Inputs: x - Horizontal coordinate, measured in tile blocks.
+    #              y - Vertical coordinate, measured in tile blocks.
+    #
+    #     Outputs: Flag bits for the block (the coordinates must be valid).
+    #---------------------------------------------------------------------------
+    def get_coarse_flags(self, x, y):
+        return self.coarse[(y // self.coarse_size) * self.coarse_width +
+                           x // self.coarse_size]
+
+#-------------------------------------------------------------------------------
+#    Function: save_level
+#
+# Description: Writes tile numbers to a chunked level file.
+#
+#      Inputs: filename    - Name of the file to write.
+#              width       - Level width, in tiles.
+#              height      - Level height, in tiles.
+#              tiles       - Flat, row-major sequence of 'width * height' tile
+#                            numbers.
+#              chunk_size  - Tiles per side of each chunk.
+#              coarse_size - Tiles per side of each block of the solidity
+#                            summary.
+#              tile_flags  - Function giving the flag bits of a tile number
+#                            (e.g., 'map.get_tile_flags').
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def save_level(filename, width, height, tiles, chunk_size, coarse_size,
+               tile_flags):
+    if len(tiles) != width * height:
+        raise ValueError('expected %d tiles, not %d' % (width * height,
+                                                        len(tiles)))
+    if chunk_size < 1 or coarse_size < 1:
+        raise ValueError('chunk sizes must be positive')
+    chunks_x = -(-width // chunk_size)
+    chunks_y = -(-height // chunk_size)
+    coarse_width = -(-width // coarse_size)
+    coarse = bytearray(coarse_width * -(-height // coarse_size))
+    flags_by_tile = {}
+    for y in range(height):
+        row = (y // coarse_size) * coarse_width
+        for x in range(width):
+            tile_num = tiles[y * width + x]
+            flags = flags_by_tile.get(tile_num)
+            if flags is None:
+                flags = flags_by_tile[tile_num] = (tile_flags(tile_num) &
+                                                   COARSE_FLAGS)
+            coarse[row + x // coarse_size] |= flags
+    for i in range(len(coarse)):
+        if not coarse[i]:
+            coarse[i] = TILE_NON_SOLID
+
+    chunks = []
+    index = array.array(CHUNKED_LEVEL_INDEX_FORMAT)
+    offset = (CHUNKED_LEVEL_HEADER.size + len(coarse) +
+              chunks_x * chunks_y * 2 * index.itemsize)
+    empty_row = [-1] * chunk_size
+    for chunk_y in range(chunks_y):
+        for chunk_x in range(chunks_x):
+            chunk = array.array(level_file.LEVEL_FILE_TILE_FORMAT)
+            first_x = chunk_x * chunk_size
+            row_length = min(chunk_size, width - first_x)
+            for y in range(chunk_y * chunk_size, (chunk_y + 1) * chunk_size):
+                if y < height:
+                    start = y * width + first_x
+                    chunk.extend(tiles[start:start + row_length])
+                    chunk.extend(empty_row[row_length:])
+                else:
+                    chunk.extend(empty_row)
+            if sys.byteorder != 'little':
+                chunk.byteswap()
+            chunks.append(zlib.compress(chunk.tobytes()))
+            index.extend((offset, len(chunks[-1])))
+            offset += len(chunks[-1])
+    if sys.byteorder != 'little':
+        index.byteswap()
+    with open(filename, 'wb') as fileOut:
+        fileOut.write(CHUNKED_LEVEL_HEADER.pack(CHUNKED_LEVEL_MAGIC,
+                                                CHUNKED_LEVEL_VERSION, width,
+                                                height, chunk_size,
+                                                coarse_size))
+        fileOut.write(coarse)
+        fileOut.write(index.tobytes())
+        fileOut.write(b''.join(chunks))
@@ -6,14 +6,16 @@
 # Description: Configuration file for Toad's Adventure.
 #-------------------------------------------------------------------------------
 
-FRAMES_PER_SECOND = 60
+FRAMES_PER_SECOND = 60 # simulation ticks per second
+RENDER_FRAMES_PER_SECOND = 120 # rendering limit (0 for no limit)
 NUM_LEVELS = 5
-MAPS = [None,
-        'maps/level1.map',
-        'maps/level2.map',
-        'maps/level3.map',
-        'maps/level4.map',
-        'maps/level5.map']
+MAPS = [None, # TMX, binary, or chunked level files (see 'Map.__init__')
+        'maps/level1.tmx',
+        'maps/level2.tmx',
+        'maps/level3.tmx',
+        'maps/level4.tmx',
+        'maps/level5.tmx']
+MAP_CACHE_DIR = 'maps/cache' # decoded TMX files (see 'tmx_file.py')
 MUSIC = [None,
          'music/overworld.mp3',  # Level 1
          'music/underworld.mp3', # Level 2
@@ -34,6 +36,9 @@ MAP_TILES_FILENAME = 'images/map_tiles.png'
 CHARACTER_TILES_FILENAME = 'images/character_tiles.png'
 MAP_TILE_SIZE = 64 # pixels per side
 CHARACTER_TILE_SIZE = 128 # pixels per side
+TILESET_RLE_ACCELERATION = True # RLE-encode tiles with transparent pixels
+MAP_CHUNK_SIZE = 16 # map tiles per side of a pre-rendered chunk
+MAP_CHUNK_CACHE_SIZE = 24 # maximum number of pre-rendered chunks kept
 
 # tiles that don't cause collision
 NON_SOLID_TILES  = frozenset([21, 22, 23, 24, 25, 26, 37, 38, 39, 44, 57, 62,
@@ -56,6 +61,15 @@ CLIMBABLE_TILES = frozenset([57, 73, 90, 91, 108])
 ICY_TILES = frozenset([12, 13, 14, 15, 27, 28, 29, 30, 31, 32, 33, 48, 49, 50,
                        51, 66, 67, 68, 129])
 
+# bit flags describing map cells (see 'Map.get_flags')
+TILE_SOLID     = 0x01
+TILE_TOP_SOLID = 0x02
+TILE_NON_SOLID = 0x04 # includes empty and out-of-bounds cells
+TILE_ICY       = 0x08
+TILE_CLIMBABLE = 0x10
+TILE_HAZARD    = 0x20
+TILE_EXIT      = 0x40
+
 NUM_GAME_CHARACTER_TYPES = 10
 PLAYER, SHY_GUY_RED, SHY_GUY_BLUE, NINJI, FLURRY, SPARK, PORCUPO, ALBATOSS, \
     POKEY, PHANTO = range(NUM_GAME_CHARACTER_TYPES)
@@ -93,6 +107,7 @@ PLAYER_STANCES = 3
 SPARK_STANCES = 3
 ALBATOSS_STANCES = 6
 PHANTO_STANCES = 0
+PLAYER_CLIMBING_STANCES = 2
 
 PLAYER_JUMPING_STANCE = 2
 NINJI_JUMPING_STANCE = 1
@@ -110,6 +125,38 @@ DEFAULT_NPC_MAX_SPEED_X = 12.0 # pixels per frame
 DEFAULT_NPC_MAX_SPEED_Y = 24.0 # pixels per frame
 PLAYER_CLIMB_RATE = 8.0 # pixels per frame
 INVINCIBILITY_AFTER_DAMAGE = 150 # game cycles
+SPATIAL_HASH_CELL_TILES = 2 # map tiles per side of a spatial hash cell
+NPC_BUMPING = True # 'True' if walking NPCs turn around when they collide
+
+# NPCs wake once within this many map tiles of the visible screen area, and
+# freeze again once farther away than the (larger) sleep margin
+NPC_WAKE_MARGIN = 4
+NPC_SLEEP_MARGIN = 8
+
+# streamed maps (see 'chunked_level.py' and 'Map.stream'): chunked level files
+# are written with chunks of MAP_STREAM_CHUNK_SIZE tiles per side and a
+# solidity summary of MAP_STREAM_COARSE_SIZE tiles per side; chunks within
+# MAP_STREAM_MARGIN tiles of the screen (enough to cover every active NPC) stay
+# loaded, and MAP_STREAM_PREFETCH more chunks around those are paged in ahead
+MAP_STREAM_CHUNK_SIZE = 32
+MAP_STREAM_COARSE_SIZE = 4
+MAP_STREAM_MARGIN = NPC_SLEEP_MARGIN + 2
+MAP_STREAM_PREFETCH = 1
+
+USE_NPC_STORE = False # 'True' to update NPCs with NumPy (see 'npc_store.py')
+
+# rewinding (see 'rewind.py'), off by default since it costs memory and time
+USE_REWIND = False
+REWIND_BUDGET_MB = 16 # memory available for recorded states
+REWIND_KEYFRAME_INTERVAL = 60 # game cycles between full states
+
+# 'True' to update only the changed parts of the display, instead of flipping
+# all of it every frame (see 'Game.update_display')
+USE_DIRTY_RECTS = False
+
+# 'True' to prepare the next level in the background while the current one is
+# played, so reaching the exit doesn't stall (see 'ToadsAdventure.load_level')
+USE_LEVEL_PRELOADING = True
 
 PLAYER_START_LOCATION = [None,
                          (1, 29),  # Level 1
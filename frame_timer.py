@@ -0,0 +1,178 @@
+#-------------------------------------------------------------------------------
+#    Filename: frame_timer.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Contains a 'FrameTimer' class for measuring where each frame's
+#              time goes.
+#-------------------------------------------------------------------------------
+
+import json
+from collections import deque
+from time import perf_counter_ns
+import pygame
+
+FRAME_TIMER_WINDOW = 300 # frames of history used for percentiles
+FRAME_TIMER_BUCKET = 250000 # histogram bucket width, in nanoseconds
+FRAME_TIMER_OVERLAY_INTERVAL = 30 # frames between overlay text updates
+FRAME_TIMER_FONT_SIZE = 24
+FRAME_TIMER_TEXT_COLOR = (255, 255, 255)
+FRAME_TIMER_BACKGROUND_COLOR = (0, 0, 0)
+TOTAL = 'frame' # name under which whole-frame durations are recorded
+
+#-------------------------------------------------------------------------------
+#       Class: FrameTimer
+#
+# Description: Records how long each phase of a frame takes (event polling,
+#              game logic, drawing, etc.), keeps rolling percentiles over
+#              recent frames plus a histogram over the whole run, and can show
+#              them on screen or save them to a file.
+#
+#     Methods: __init__, start_frame, mark, end_frame, get_percentiles, draw,
+#              dump
+#-------------------------------------------------------------------------------
+class FrameTimer:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates a frame timer with no recorded frames.
+    #
+    #      Inputs: window - Number of recent frames used for percentiles.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, window=FRAME_TIMER_WINDOW):
+        self.window = window
+        self.phases = [] # phase names, in order of first appearance
+        self.samples = {} # recent durations per phase, in nanoseconds
+        self.histograms = {} # bucket index -> count, per phase
+        self.current = {} # durations recorded so far in the current frame
+        self.frame_start = self.last_mark = perf_counter_ns()
+        self.frames = 0
+        self.font = None
+        self.overlay = None
+
+    #---------------------------------------------------------------------------
+    #      Method: start_frame
+    #
+    # Description: Marks the beginning of a frame.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def start_frame(self):
+        self.current = {}
+        self.frame_start = self.last_mark = perf_counter_ns()
+
+    #---------------------------------------------------------------------------
+    #      Method: mark
+    #
+    # Description: Attributes the time since the previous mark (or the start of
+    #              the frame) to a given phase.
+    #
+    #      Inputs: phase - Name of the phase that just finished.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def mark(self, phase):
+        now = perf_counter_ns()
+        self.current[phase] = self.current.get(phase, 0) + now - self.last_mark
+        self.last_mark = now
+
+    #---------------------------------------------------------------------------
+    #      Method: end_frame
+    #
+    # Description: Records the durations of the frame's phases, and of the
+    #              frame as a whole.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def end_frame(self):
+        self.current[TOTAL] = perf_counter_ns() - self.frame_start
+        for (phase, duration) in self.current.items():
+            if phase not in self.samples:
+                self.phases.append(phase)
+                self.samples[phase] = deque(maxlen=self.window)
+                self.histograms[phase] = {}
+            self.samples[phase].append(duration)
+            histogram = self.histograms[phase]
+            bucket = duration // FRAME_TIMER_BUCKET
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        self.frames += 1
+
+    #---------------------------------------------------------------------------
+    #      Method: get_percentiles
+    #
+    # Description: Computes percentiles of a phase's recent durations.
+    #
+    #      Inputs: phase       - Name of the phase of interest.
+    #              percentiles - Percentiles to compute (0 to 100).
+    #
+    #     Outputs: List of durations, in milliseconds, one per percentile.
+    #---------------------------------------------------------------------------
+    def get_percentiles(self, phase, percentiles=(50, 95, 99)):
+        samples = sorted(self.samples.get(phase, ()))
+        if not samples:
+            return [0.0 for p in percentiles]
+        return [samples[min(len(samples) - 1, len(samples) * p // 100)] / 1e6
+                for p in percentiles]
+
+    #---------------------------------------------------------------------------
+    #      Method: draw
+    #
+    # Description: Draws an overlay listing p50/p95/p99 durations per phase in
+    #              the upper-left corner of a surface. The text is only
+    #              re-rendered every FRAME_TIMER_OVERLAY_INTERVAL frames.
+    #
+    #      Inputs: surface - The surface on which to draw.
+    #
+    #     Outputs: The 'Rect' covered by the overlay.
+    #---------------------------------------------------------------------------
+    def draw(self, surface):
+        if (self.overlay is None or
+            self.frames % FRAME_TIMER_OVERLAY_INTERVAL == 0):
+            if self.font is None:
+                pygame.font.init()
+                self.font = pygame.font.Font(None, FRAME_TIMER_FONT_SIZE)
+            lines = ['%-10s %6s %6s %6s' % ('ms', 'p50', 'p95', 'p99')]
+            for phase in self.phases:
+                lines.append('%-10s %6.2f %6.2f %6.2f' %
+                             tuple([phase] + self.get_percentiles(phase)))
+            self.overlay = [self.font.render(line, True,
+                                             FRAME_TIMER_TEXT_COLOR,
+                                             FRAME_TIMER_BACKGROUND_COLOR)
+                            for line in lines]
+        (width, y) = (0, 0)
+        for line in self.overlay:
+            surface.blit(line, (0, y))
+            width = max(width, line.get_width())
+            y += line.get_height()
+        return pygame.Rect(0, 0, width, y)
+
+    #---------------------------------------------------------------------------
+    #      Method: dump
+    #
+    # Description: Saves recent percentiles and whole-run histograms of every
+    #              phase to a JSON file.
+    #
+    #      Inputs: filename - Name of the file to write.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def dump(self, filename):
+        report = {'frames': self.frames,
+                  'bucket_ms': FRAME_TIMER_BUCKET / 1e6,
+                  'phases': {}}
+        for phase in self.phases:
+            (p50, p95, p99) = self.get_percentiles(phase)
+            histogram = self.histograms[phase]
+            report['phases'][phase] = {
+                'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+                'histogram': [[bucket * FRAME_TIMER_BUCKET / 1e6,
+                               histogram[bucket]]
+                              for bucket in sorted(histogram)]}
+        with open(filename, 'w') as fileOut:
+            json.dump(report, fileOut, indent=2)
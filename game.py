@@ -6,32 +6,77 @@
 # Description: Contains an abstract 'Game' class.
 #-------------------------------------------------------------------------------
 
+import itertools
 import pygame
 from pygame import display, time, event
+from time import perf_counter
+from frame_timer import FrameTimer
+
+DEFAULT_HEADLESS_SIZE = (1920, 1080) # pixels
+MAX_TICKS_PER_FRAME = 5 # limits catch-up after long stalls
+DIRTY_RECT_MAX_AREA = 0.5 # fraction of the screen beyond which it's flipped
 
 #-------------------------------------------------------------------------------
 #       Class: Game
 #
 # Description: An abstract class for fullscreen games.
 #
-#     Methods: __init__, game_logic (virtual), paint (virtual), main_loop
+#     Methods: __init__, game_logic (virtual), paint (virtual),
+#              repaint (virtual), mark_phase, invalidate, draw_overlay,
+#              update_display, main_loop, run_headless, finish
 #-------------------------------------------------------------------------------
 class Game:
     #---------------------------------------------------------------------------
     #      Method: __init__
     #
-    # Description: Initializes the game's display mode and basic stats.
+    # Description: Initializes the game's display mode and basic stats. In
+    #              headless mode no display is opened; an offscreen surface
+    #              may optionally serve as the render target instead.
     #
-    #      Inputs: fps - Desired frames per second.
+    #      Inputs: fps        - Simulation ticks per second.
+    #              render_fps - Maximum rendered frames per second (0 for no
+    #                           limit).
+    #              headless   - 'True' to run without opening a display.
+    #              offscreen  - 'True' to render into an offscreen surface
+    #                           while headless ('None' is used as screen
+    #                           otherwise).
+    #              size       - (width, height) of the headless screen.
+    #              timings    - 'True' to record per-phase frame timings.
+    #              overlay    - 'True' to also show those timings on screen.
+    #              timings_filename - Optional file to which timings are saved
+    #                                 when the game ends.
+    #              dirty_rects      - 'True' to update only the parts of the
+    #                                 display that 'paint' reports changed
+    #                                 (see 'update_display').
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
-    def __init__(self, fps=60):
+    def __init__(self, fps=60, render_fps=0, headless=False, offscreen=False,
+                 size=DEFAULT_HEADLESS_SIZE, timings=False, overlay=False,
+                 timings_filename=None, dirty_rects=False):
         self.fps = fps
-        self.screen = display.set_mode((0, 0), pygame.FULLSCREEN |
-                                       pygame.HWSURFACE | pygame.DOUBLEBUF)
-        self.width = display.Info().current_w
-        self.height = display.Info().current_h
+        self.render_fps = render_fps
+        self.headless = headless
+        self.frame_timer = None
+        if timings or overlay or timings_filename:
+            self.frame_timer = FrameTimer()
+        self.show_timings = overlay
+        self.timings_filename = timings_filename
+        self.recorder = None # optional 'InputRecorder' fed every tick
+        self.use_dirty_rects = dirty_rects
+        self.damage = None # rects changed by 'paint' ('None' for everything)
+        self.needs_redraw = True # 'True' if 'paint' must redraw everything
+        self.overlay_rect = None # where the timing overlay was last drawn
+        if headless:
+            (self.width, self.height) = size
+            self.screen = None
+            if offscreen:
+                self.screen = pygame.Surface(size)
+        else:
+            self.screen = display.set_mode((0, 0), pygame.FULLSCREEN |
+                                           pygame.HWSURFACE | pygame.DOUBLEBUF)
+            self.width = display.Info().current_w
+            self.height = display.Info().current_h
         self.on = True
 
     #---------------------------------------------------------------------------
@@ -51,42 +96,242 @@ class Game:
     #---------------------------------------------------------------------------
     #      Method: paint
     #
-    # Description: Virtual method intended to draw images to the screen.
+    # Description: Virtual method intended to draw images to the screen. It
+    #              may set 'damage' to a list of the rects it changed, leaving
+    #              the rest of the surface as the previous call left it, unless
+    #              'needs_redraw' is set; the default, 'None', means all of
+    #              the surface changed.
     #
     #      Inputs: surface - The surface on which to draw.
+    #              alpha   - Fraction of a tick elapsed since the last call to
+    #                        'game_logic' (0.0 to 1.0), for interpolation.
     #
     #     Outputs: Raises an error if not implemented by a child class.
     #---------------------------------------------------------------------------
-    def paint(self, surface):
+    def paint(self, surface, alpha=1.0):
         raise NotImplementedError()
 
+    #---------------------------------------------------------------------------
+    #      Method: repaint
+    #
+    # Description: Virtual method intended to redraw parts of the screen as
+    #              the latest call to 'paint' left them (erasing whatever was
+    #              drawn over them since). Only needed for dirty-rect mode.
+    #
+    #      Inputs: surface - The surface on which to draw.
+    #              rects   - List of 'Rect' objects covering the areas to
+    #                        redraw.
+    #
+    #     Outputs: Raises an error if not implemented by a child class.
+    #---------------------------------------------------------------------------
+    def repaint(self, surface, rects):
+        raise NotImplementedError()
+
+    #---------------------------------------------------------------------------
+    #      Method: mark_phase
+    #
+    # Description: Attributes the time since the previous phase ended to a
+    #              given phase of the current frame, if timings are being
+    #              recorded. 'paint' is timed only through this, so child
+    #              classes should mark each of its phases.
+    #
+    #      Inputs: phase - Name of the phase that just finished.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def mark_phase(self, phase):
+        if self.frame_timer is not None:
+            self.frame_timer.mark(phase)
+
+    #---------------------------------------------------------------------------
+    #      Method: invalidate
+    #
+    # Description: Makes the next call to 'paint' redraw the whole screen (for
+    #              instance, after something was drawn over it).
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def invalidate(self):
+        self.needs_redraw = True
+
+    #---------------------------------------------------------------------------
+    #      Method: draw_overlay
+    #
+    # Description: Draws the timing overlay over what 'paint' drew. If only
+    #              parts of the screen were painted, the previous overlay is
+    #              erased first (it may have been larger), and both areas are
+    #              added to 'damage'.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def draw_overlay(self):
+        if self.damage is not None and self.overlay_rect is not None:
+            self.repaint(self.screen, [self.overlay_rect])
+            self.damage.append(self.overlay_rect)
+        self.overlay_rect = self.frame_timer.draw(self.screen)
+        if self.damage is not None:
+            self.damage.append(self.overlay_rect)
+
+    #---------------------------------------------------------------------------
+    #      Method: update_display
+    #
+    # Description: Shows what 'paint' drew. In dirty-rect mode only the rects
+    #              it reported changing are updated (and nothing at all if
+    #              there are none), unless they cover more than
+    #              DIRTY_RECT_MAX_AREA of the screen; otherwise the whole
+    #              display is flipped.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def update_display(self):
+        damage = self.damage
+        if not self.use_dirty_rects or damage is None:
+            display.flip()
+        elif damage:
+            area = sum([rect.width * rect.height for rect in damage])
+            if area > DIRTY_RECT_MAX_AREA * self.width * self.height:
+                display.flip()
+            else:
+                display.update(damage)
+
     #---------------------------------------------------------------------------
     #      Method: main_loop
     #
     # Description: Manages game speed, 'QUIT' events, and keyboard input. Calls
-    #              'game_logic' and 'draw', then updates the display.
+    #              'game_logic' at a fixed rate of 'fps' ticks per second and,
+    #              independently, 'paint' (followed by a display update) as
+    #              often as 'render_fps' allows, interpolating between ticks.
+    #              If timings are recorded, F3 toggles their overlay.
     #
-    #      Inputs: None.
+    #      Inputs: inputs - Optional iterable of (keys, new_keys) tuples, one
+    #                       per tick, replayed instead of live keyboard input.
+    #                       The game ends when it runs out.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
-    def main_loop(self):
+    def main_loop(self, inputs=None):
         clock = time.Clock()
         keys = set()
+        new_keys = set()
+        tick_length = 1.0 / self.fps
+        accumulator = 0.0
+        previous_time = perf_counter()
+        timer = self.frame_timer
+        if inputs is not None:
+            inputs = iter(inputs)
         while True:
-            clock.tick(self.fps)
-            new_keys = set()
+            clock.tick(self.render_fps)
+            if timer is not None:
+                timer.start_frame()
+            current_time = perf_counter()
+            accumulator += current_time - previous_time
+            previous_time = current_time
+            if accumulator > tick_length * MAX_TICKS_PER_FRAME:
+                accumulator = tick_length * MAX_TICKS_PER_FRAME
             for e in event.get():
                 if (e.type == pygame.QUIT or
                     (e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE)):
+                    self.finish()
                     pygame.quit()
                     return
+                if (timer is not None and e.type == pygame.KEYDOWN and
+                    e.key == pygame.K_F3):
+                    self.show_timings = not self.show_timings
+                    self.invalidate() # to add or erase the overlay
+                    continue
+                if e.type == pygame.WINDOWEXPOSED:
+                    self.invalidate()
+                if inputs is not None: # keys come from the replay
+                    continue
                 if e.type == pygame.KEYDOWN:
                     keys.add(e.key)
                     new_keys.add(e.key)
                 if e.type == pygame.KEYUP:
                     keys.discard(e.key)
+            if timer is not None:
+                timer.mark('events')
             if self.on:
+                while accumulator >= tick_length:
+                    if inputs is not None:
+                        (keys, new_keys) = next(inputs, (None, None))
+                        if keys is None: # replay finished
+                            self.finish()
+                            pygame.quit()
+                            return
+                    if self.recorder is not None:
+                        self.recorder.record(keys, new_keys)
+                    self.game_logic(keys, new_keys)
+                    new_keys = set() # only the first tick sees new presses
+                    accumulator -= tick_length
+                if timer is not None:
+                    timer.mark('logic')
+                self.paint(self.screen, accumulator / tick_length)
+                if timer is not None:
+                    if self.show_timings:
+                        self.draw_overlay()
+                        timer.mark('overlay')
+                self.update_display()
+                if timer is not None:
+                    timer.mark('flip')
+                    timer.end_frame()
+            else:
+                accumulator = 0.0
+
+    #---------------------------------------------------------------------------
+    #      Method: run_headless
+    #
+    # Description: Steps 'game_logic' as fast as possible, without waiting on a
+    #              clock or polling events. If an offscreen render target
+    #              exists, 'paint' is called on it after every step, but the
+    #              display is never flipped. Timings and input, if recorded,
+    #              are saved when done.
+    #
+    #      Inputs: num_frames - Maximum number of frames to simulate.
+    #              inputs     - Optional iterable of (keys, new_keys) tuples,
+    #                           one per frame. Without it, no keys are pressed.
+    #
+    #     Outputs: Number of frames actually simulated.
+    #---------------------------------------------------------------------------
+    def run_headless(self, num_frames, inputs=None):
+        if inputs is None:
+            inputs = itertools.repeat((frozenset(), frozenset()))
+        timer = self.frame_timer
+        frames = 0
+        for (keys, new_keys) in itertools.islice(inputs, num_frames):
+            if timer is not None:
+                timer.start_frame()
+            if self.on:
+                if self.recorder is not None:
+                    self.recorder.record(keys, new_keys)
                 self.game_logic(keys, new_keys)
-                self.paint(self.screen)
-                display.flip()
+                if timer is not None:
+                    timer.mark('logic')
+                if self.screen is not None:
+                    self.paint(self.screen)
+            if timer is not None:
+                timer.end_frame()
+            frames += 1
+        self.finish()
+        return frames
+
+    #---------------------------------------------------------------------------
+    #      Method: finish
+    #
+    # Description: Saves recorded frame timings, if a file was given for them,
+    #              and recorded input.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def finish(self):
+        if self.frame_timer is not None and self.timings_filename:
+            self.frame_timer.dump(self.timings_filename)
+        if self.recorder is not None:
+            self.recorder.save()
@@ -0,0 +1,67 @@
+#-------------------------------------------------------------------------------
+#    Filename: game_clock.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Contains a 'GameClock' class for measuring time in simulation
+#              ticks rather than on the wall clock.
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+#       Class: GameClock
+#
+# Description: Counts simulation ticks, so game behavior that depends on time
+#              is the same whether the game runs in real time or faster.
+#
+#     Methods: __init__, tick, get_ticks, get_time
+#-------------------------------------------------------------------------------
+class GameClock:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates a clock at tick 0.
+    #
+    #      Inputs: fps   - Simulation ticks per second.
+    #              ticks - Initial tick count.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, fps, ticks=0):
+        self.fps = fps
+        self.ticks = ticks
+
+    #---------------------------------------------------------------------------
+    #      Method: tick
+    #
+    # Description: Advances the clock by one tick.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def tick(self):
+        self.ticks += 1
+
+    #---------------------------------------------------------------------------
+    #      Method: get_ticks
+    #
+    # Description: Returns the number of ticks simulated so far.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: Tick count.
+    #---------------------------------------------------------------------------
+    def get_ticks(self):
+        return self.ticks
+
+    #---------------------------------------------------------------------------
+    #      Method: get_time
+    #
+    # Description: Returns the simulated time elapsed so far.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: Elapsed time, in seconds.
+    #---------------------------------------------------------------------------
+    def get_time(self):
+        return self.ticks / self.fps
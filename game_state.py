@@ -0,0 +1,113 @@
+#-------------------------------------------------------------------------------
+#    Filename: game_state.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Contains a 'GameState' class holding a snapshot of everything
+#              that changes while Toad's Adventure is played, so a game can be
+#              restored to it later (rewinding, save states, or branching many
+#              simulations from one point).
+#-------------------------------------------------------------------------------
+
+import struct
+
+GAME_STATE_MAGIC = b'TOAS'
+GAME_STATE_VERSION = 1
+GAME_STATE_HEADER = struct.Struct('<4sHH?xxxIII') # magic, version, level,
+                                                  # level complete, ticks,
+                                                  # player and NPC state sizes
+RNG_STATE = struct.Struct('<I625I?d') # version, internal state, gauss_next
+
+#-------------------------------------------------------------------------------
+#       Class: GameState
+#
+# Description: A snapshot of a game, never changed once taken. Characters are
+#              stored as packed bytes (see 'GameCharacter.get_state'), while
+#              the map, which never changes during play, is shared by
+#              reference.
+#
+#     Methods: __init__, to_bytes, from_bytes (static)
+#-------------------------------------------------------------------------------
+class GameState:
+    __slots__ = ('level', 'level_complete', 'map', 'ticks', 'rng_state',
+                 'player', 'NPCs')
+
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates a snapshot from its parts.
+    #
+    #      Inputs: level          - Number of the current level.
+    #              level_complete - 'True' if the level's exit was reached.
+    #              map            - The current map, or 'None' if it must be
+    #                               loaded again on restore.
+    #              ticks          - Ticks counted by the game's clock.
+    #              rng_state      - State of the game's random number
+    #                               generator ('random.Random.getstate').
+    #              player         - Packed state of the player character.
+    #              NPCs           - Packed states of every NPC, concatenated.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, level, level_complete, map, ticks, rng_state, player,
+                 NPCs):
+        self.level = level
+        self.level_complete = level_complete
+        self.map = map
+        self.ticks = ticks
+        self.rng_state = rng_state
+        self.player = player
+        self.NPCs = NPCs
+
+    #---------------------------------------------------------------------------
+    #      Method: to_bytes
+    #
+    # Description: Encodes the snapshot, except for the map, so it may be saved
+    #              to a file.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: A bytes object.
+    #---------------------------------------------------------------------------
+    def to_bytes(self):
+        (version, internal_state, gauss_next) = self.rng_state
+        return b''.join((GAME_STATE_HEADER.pack(GAME_STATE_MAGIC,
+                                                GAME_STATE_VERSION,
+                                                self.level,
+                                                self.level_complete,
+                                                self.ticks, len(self.player),
+                                                len(self.NPCs)),
+                         RNG_STATE.pack(version, *internal_state,
+                                        gauss_next is not None,
+                                        gauss_next or 0.0),
+                         self.player, self.NPCs))
+
+    #---------------------------------------------------------------------------
+    #      Method: from_bytes
+    #
+    # Description: Decodes a snapshot encoded by 'to_bytes'. Its map is 'None'.
+    #
+    #      Inputs: data - Bytes-like object holding the snapshot.
+    #
+    #     Outputs: A 'GameState'.
+    #---------------------------------------------------------------------------
+    @staticmethod
+    def from_bytes(data):
+        if len(data) < GAME_STATE_HEADER.size + RNG_STATE.size:
+            raise ValueError('too small to be a game state')
+        (magic, version, level, level_complete, ticks, player_size,
+         NPCs_size) = GAME_STATE_HEADER.unpack_from(data)
+        if magic != GAME_STATE_MAGIC:
+            raise ValueError('not a game state')
+        if version != GAME_STATE_VERSION:
+            raise ValueError('unsupported game state version %d' % version)
+        rng = RNG_STATE.unpack_from(data, GAME_STATE_HEADER.size)
+        rng_state = (rng[0], rng[1:-2], rng[-1] if rng[-2] else None)
+        start = GAME_STATE_HEADER.size + RNG_STATE.size
+        if len(data) < start + player_size + NPCs_size:
+            raise ValueError('truncated game state')
+        player = bytes(data[start:start + player_size])
+        NPCs = bytes(data[start + player_size:
+                          start + player_size + NPCs_size])
+        return GameState(level, level_complete, None, ticks, rng_state,
+                         player, NPCs)
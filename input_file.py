@@ -0,0 +1,188 @@
+#-------------------------------------------------------------------------------
+#    Filename: input_file.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Records the keys pressed on each tick of a game to a compact
+#              binary file, and reads them back for deterministic replay.
+#
+#              An input file consists of a 20-byte header (magic, version,
+#              level, ticks per second, random seed, and tick count) followed
+#              by records for the ticks on which input changed. Each record is
+#              a sequence of unsigned LEB128 varints: the number of unchanged
+#              ticks since the previous record, the number of entries, then
+#              one entry per key, '(key << 2) | flags', where bit 0 means the
+#              key was pressed or released and bit 1 means it is in
+#              'new_keys'. Ticks without any change take no space.
+#-------------------------------------------------------------------------------
+
+import struct
+
+INPUT_FILE_MAGIC = b'TOAI'
+INPUT_FILE_VERSION = 1
+INPUT_FILE_HEADER = struct.Struct('<4sHHHxxII') # magic, version, level, fps,
+                                                # seed, ticks
+KEY_TOGGLED = 0x01
+KEY_NEW = 0x02
+
+#-------------------------------------------------------------------------------
+#       Class: InputRecorder
+#
+# Description: Accumulates per-tick input and writes it to an input file.
+#
+#     Methods: __init__, record, save
+#-------------------------------------------------------------------------------
+class InputRecorder:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates an input recorder with nothing recorded.
+    #
+    #      Inputs: filename - Name of the file to write when saving.
+    #              level    - Number of the level being played.
+    #              fps      - Simulation ticks per second.
+    #              seed     - Seed of the game's random number generator.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, filename, level, fps, seed):
+        self.filename = filename
+        self.level = level
+        self.fps = fps
+        self.seed = seed
+        self.ticks = 0
+        self.idle_ticks = 0 # ticks since the last record
+        self.previous_keys = frozenset()
+        self.data = bytearray()
+
+    #---------------------------------------------------------------------------
+    #      Method: record
+    #
+    # Description: Records the input given to one call to 'game_logic'.
+    #
+    #      Inputs: keys     - Keys currently pressed.
+    #              new_keys - Keys currently pressed that weren't before.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def record(self, keys, new_keys):
+        toggled = self.previous_keys.symmetric_difference(keys)
+        self.ticks += 1
+        if not toggled and not new_keys:
+            self.idle_ticks += 1
+            return
+        entries = []
+        for key in toggled.union(new_keys):
+            flags = 0
+            if key in toggled:
+                flags |= KEY_TOGGLED
+            if key in new_keys:
+                flags |= KEY_NEW
+            entries.append((key << 2) | flags)
+        write_varint(self.data, self.idle_ticks)
+        write_varint(self.data, len(entries))
+        for entry in sorted(entries):
+            write_varint(self.data, entry)
+        self.idle_ticks = 0
+        self.previous_keys = frozenset(keys)
+
+    #---------------------------------------------------------------------------
+    #      Method: save
+    #
+    # Description: Writes everything recorded so far to the input file.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def save(self):
+        with open(self.filename, 'wb') as fileOut:
+            fileOut.write(INPUT_FILE_HEADER.pack(INPUT_FILE_MAGIC,
+                                                 INPUT_FILE_VERSION,
+                                                 self.level, self.fps,
+                                                 self.seed, self.ticks))
+            fileOut.write(self.data)
+
+#-------------------------------------------------------------------------------
+#    Function: load_inputs
+#
+# Description: Reads an input file.
+#
+#      Inputs: filename - Name of an input file.
+#
+#     Outputs: A tuple containing the recorded level, ticks per second, random
+#              seed, and a list of (keys, new_keys) tuples of frozensets, one
+#              per tick.
+#-------------------------------------------------------------------------------
+def load_inputs(filename):
+    with open(filename, 'rb') as fileIn:
+        data = fileIn.read()
+    if len(data) < INPUT_FILE_HEADER.size:
+        raise ValueError('%s is too small to be an input file' % filename)
+    (magic, version, level, fps, seed,
+     num_ticks) = INPUT_FILE_HEADER.unpack_from(data)
+    if magic != INPUT_FILE_MAGIC:
+        raise ValueError('%s is not an input file' % filename)
+    if version != INPUT_FILE_VERSION:
+        raise ValueError('%s has unsupported version %d' % (filename, version))
+    inputs = []
+    keys = frozenset()
+    no_keys = frozenset()
+    position = INPUT_FILE_HEADER.size
+    while position < len(data):
+        (idle_ticks, position) = read_varint(data, position)
+        inputs.extend([(keys, no_keys)] * idle_ticks)
+        (num_entries, position) = read_varint(data, position)
+        toggled = set()
+        new_keys = set()
+        for i in range(num_entries):
+            (entry, position) = read_varint(data, position)
+            if entry & KEY_TOGGLED:
+                toggled.add(entry >> 2)
+            if entry & KEY_NEW:
+                new_keys.add(entry >> 2)
+        keys = keys.symmetric_difference(toggled)
+        inputs.append((keys, frozenset(new_keys)))
+    if len(inputs) > num_ticks:
+        raise ValueError('%s is corrupt' % filename)
+    inputs.extend([(keys, no_keys)] * (num_ticks - len(inputs)))
+    return (level, fps, seed, inputs)
+
+#-------------------------------------------------------------------------------
+#    Function: write_varint
+#
+# Description: Appends a non-negative integer as an unsigned LEB128 varint.
+#
+#      Inputs: data  - The bytearray to append to.
+#              value - The integer to append.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def write_varint(data, value):
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+#-------------------------------------------------------------------------------
+#    Function: read_varint
+#
+# Description: Reads an unsigned LEB128 varint.
+#
+#      Inputs: data     - Bytes-like object to read from.
+#              position - Index of the varint's first byte.
+#
+#     Outputs: A tuple containing the integer and the index following it.
+#-------------------------------------------------------------------------------
+def read_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError('truncated input file')
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value, position)
+        shift += 7
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+
+#-------------------------------------------------------------------------------
+#    Filename: level_file.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Reads and writes the binary level format used by Toad's
+#              Adventure. A level file consists of a 16-byte header followed
+#              by a row-major array of little-endian signed 16-bit tile numbers
+#              (-1 for an empty tile), so it can be memory-mapped and indexed
+#              directly. Run as a script to convert text '.map' files.
+#-------------------------------------------------------------------------------
+
+import array
+import ast
+import mmap
+import struct
+import sys
+
+LEVEL_FILE_MAGIC = b'TOAD'
+LEVEL_FILE_VERSION = 1
+LEVEL_FILE_HEADER = struct.Struct('<4sHHHxxxxxx') # magic, version, w, h
+LEVEL_FILE_TILE_FORMAT = 'h' # signed 16-bit
+
+#-------------------------------------------------------------------------------
+#    Function: load_level
+#
+# Description: Memory-maps a binary level file and exposes its tiles as a flat,
+#              read-only sequence of integers.
+#
+#      Inputs: filename - Name of a binary level file.
+#
+#     Outputs: A tuple containing the level's width, height, and a 'memoryview'
+#              of its tile numbers (indexed as 'y * width + x').
+#-------------------------------------------------------------------------------
+def load_level(filename):
+    with open(filename, 'rb') as fileIn:
+        data = mmap.mmap(fileIn.fileno(), 0, access=mmap.ACCESS_READ)
+    (width, height) = read_header(data, filename)
+    end = LEVEL_FILE_HEADER.size + width * height * 2
+    if len(data) < end:
+        raise ValueError('%s is truncated' % filename)
+    if sys.byteorder == 'little':
+        tiles = memoryview(data)[LEVEL_FILE_HEADER.size:end].cast(
+            LEVEL_FILE_TILE_FORMAT)
+    else:
+        tiles = array.array(LEVEL_FILE_TILE_FORMAT,
+                            data[LEVEL_FILE_HEADER.size:end])
+        tiles.byteswap()
+        tiles = memoryview(tiles)
+    return (width, height, tiles)
+
+#-------------------------------------------------------------------------------
+#    Function: read_header
+#
+# Description: Validates a binary level file's header.
+#
+#      Inputs: data     - Bytes-like object holding at least the header.
+#              filename - Name of the file, for error messages.
+#
+#     Outputs: A tuple containing the level's width and height.
+#-------------------------------------------------------------------------------
+def read_header(data, filename):
+    if len(data) < LEVEL_FILE_HEADER.size:
+        raise ValueError('%s is too small to be a level file' % filename)
+    (magic, version, width, height) = LEVEL_FILE_HEADER.unpack_from(data)
+    if magic != LEVEL_FILE_MAGIC:
+        raise ValueError('%s is not a level file' % filename)
+    if version != LEVEL_FILE_VERSION:
+        raise ValueError('%s has unsupported version %d' % (filename, version))
+    return (width, height)
+
+#-------------------------------------------------------------------------------
+#    Function: save_level
+#
+# Description: Writes tile numbers to a binary level file.
+#
+#      Inputs: filename - Name of the file to write.
+#              width    - Level width, in tiles.
+#              height   - Level height, in tiles.
+#              tiles    - Flat, row-major sequence of 'width * height' tile
+#                         numbers.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def save_level(filename, width, height, tiles):
+    if len(tiles) != width * height:
+        raise ValueError('expected %d tiles, not %d' % (width * height,
+                                                        len(tiles)))
+    data = array.array(LEVEL_FILE_TILE_FORMAT, tiles)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    with open(filename, 'wb') as fileOut:
+        fileOut.write(LEVEL_FILE_HEADER.pack(LEVEL_FILE_MAGIC,
+                                             LEVEL_FILE_VERSION, width, height))
+        fileOut.write(data.tobytes())
+
+#-------------------------------------------------------------------------------
+#    Function: convert_text_map
+#
+# Description: Converts a text '.map' file (a Python list of rows, as written
+#              by 'maps/convert_map.py') into a binary level file. Rows of
+#              unequal length are truncated to the shortest one.
+#
+#      Inputs: in_filename  - Name of the text map file.
+#              out_filename - Name of the binary level file to write.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def convert_text_map(in_filename, out_filename):
+    with open(in_filename, 'r') as fileIn:
+        rows = ast.literal_eval(fileIn.read())
+    height = len(rows)
+    width = min(len(row) for row in rows)
+    for i in range(height):
+        if len(rows[i]) != width: # rows should have equal length
+            print('Error in row %d of %s (length %d)' % (i, in_filename,
+                                                         len(rows[i])))
+    tiles = []
+    for row in rows:
+        tiles.extend(row[:width])
+    save_level(out_filename, width, height, tiles)
+
+#-------------------------------------------------------------------------------
+#    Function: main
+#
+# Description: Converts text map files given on the command line, writing each
+#              to a file of the same name with a '.lvl' extension.
+#
+#      Inputs: None, but file names are read from the command line.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def main():
+    if len(sys.argv) < 2:
+        print('Usage:', sys.argv[0], '<in.map> [<in.map> ...]')
+        sys.exit(-1)
+    for in_filename in sys.argv[1:]:
+        out_filename = in_filename.rsplit('.', 1)[0] + '.lvl'
+        convert_text_map(in_filename, out_filename)
+
+if __name__ == '__main__':
+    main()
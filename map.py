@@ -7,22 +7,44 @@
 #              2.7 and Pygame 1.9.
 #-------------------------------------------------------------------------------
 
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import pygame
+from pygame import display
+import chunked_level
+import level_file
+import tmx_file
+from render_queue import RENDER_LAYER_MAP
 from config import *
 
+# pages in chunks of streamed maps (threads start on first use)
+stream_executor = ThreadPoolExecutor(max_workers=1,
+                                     thread_name_prefix='map-streaming')
+
 #-------------------------------------------------------------------------------
 #       Class: Map
 #
 # Description: A rectangular grid of tiles representing a game map/level.
 #
 #     Methods: __init__, get_size, get_tile_number, get_tile_number_at,
-#              get_tile, is_solid_at, is_non_solid_at, draw
+#              get_tile, get_flags, get_flags_at, is_solid_at, is_non_solid_at,
+#              get_chunk, render_chunk, prepare_view, draw, is_view_at,
+#              restore, reuse_view, stream, _draw_region, _build_flags,
+#              _open_stream, _get_stream_chunk, _read_stream_chunk, _page_in,
+#              _get_streamed_tile_number, _get_streamed_flags,
+#              _get_streamed_flags_at
+#
+#   Functions: get_tile_flags
 #-------------------------------------------------------------------------------
 class Map:
     #---------------------------------------------------------------------------
     #      Method: __init__
     #
-    # Description: Sets up a map/level by reading a map file.
+    # Description: Sets up a map/level from its TMX file (decoded once, then
+    #              memory-mapped from the cache), binary level file, or chunked
+    #              level file. Chunked ('.lvc') maps are streamed: only chunks
+    #              near the player stay in memory (see 'stream').
     #
     #      Inputs: level         - Number corresponding to the desired level.
     #              tiles         - Tileset object to supply tile images.
@@ -40,26 +62,34 @@ class Map:
         self.screen_width = screen_width
         self.screen_height = screen_height
 
-        fileIn = open(MAPS[level], 'r')
-        self.map = eval(fileIn.read())
-        fileIn.close()
-
-        self.map_height = len(self.map)
-        lowest_map_width = len(self.map[0])
-        for i in range(self.map_height):
-            map_width = len(self.map[i])
-            if map_width != lowest_map_width: # rows should have equal length
-                print('Error in row %d of %s (length %d)' % (i, MAPS[level],
-                      map_width))
-                if map_width < lowest_map_width:
-                    lowest_map_width = map_width
-        self.map_width = lowest_map_width
-
         self.bg_color = pygame.Color(MAP_BACKGROUNDS[level])
         self.player_start_location = (
             (PLAYER_START_LOCATION[level][0] - 1) * MAP_TILE_SIZE,
             (PLAYER_START_LOCATION[level][1] - 1) * MAP_TILE_SIZE)
 
+        self.stream_level = None
+        if MAPS[level].endswith('.lvc'):
+            self._open_stream(MAPS[level])
+        else:
+            if MAPS[level].endswith('.tmx'):
+                (self.map_width, self.map_height,
+                 self.map) = tmx_file.load_level(MAPS[level], MAP_CACHE_DIR)
+            else:
+                (self.map_width, self.map_height,
+                 self.map) = level_file.load_level(MAPS[level])
+            self._build_flags()
+
+        # pre-rendered chunks, least recently used first
+        self.chunk_pixels = MAP_CHUNK_SIZE * MAP_TILE_SIZE
+        self.chunks = OrderedDict()
+        visible_chunks = ((screen_width // self.chunk_pixels + 2) *
+                          (screen_height // self.chunk_pixels + 2))
+        self.max_chunks = max(MAP_CHUNK_CACHE_SIZE, visible_chunks * 2)
+
+        # what's on screen, kept between frames (see 'draw')
+        self.view = None
+        self.view_position = None # map pixel at the top-left corner
+
     #---------------------------------------------------------------------------
     #      Method: get_size
     #
@@ -87,7 +117,7 @@ class Map:
     def get_tile_number(self, x, y):
         if x < 0 or y < 0 or x >= self.map_width or y >= self.map_height:
             return -1
-        return self.map[y][x] # y == row, x == column
+        return self.map[y * self.map_width + x] # y == row, x == column
 
     #---------------------------------------------------------------------------
     #      Method: get_tile_number_at
@@ -125,6 +155,55 @@ class Map:
         tile_num = self.get_tile_number(x, y)
         return self.tiles.get_image(tile_num)
 
+    #---------------------------------------------------------------------------
+    #      Method: get_flags
+    #
+    # Description: Given the tile coordinates for a location, returns the flag
+    #              bits (TILE_SOLID, TILE_ICY, etc.) of the corresponding cell.
+    #
+    #      Inputs: x - Horizontal coordinate, measured in tile blocks.
+    #              y - Vertical coordinate, measured in tile blocks.
+    #
+    #     Outputs: Flag bits for the location in question (TILE_NON_SOLID if
+    #              the coordinates are invalid).
+    #---------------------------------------------------------------------------
+    def get_flags(self, x, y):
+        # clamp into the border of out-of-bounds cells surrounding the map
+        if x < 0:
+            x = -1
+        elif x > self.map_width:
+            x = self.map_width
+        if y < 0:
+            y = -1
+        elif y > self.map_height:
+            y = self.map_height
+        return self.flags[(y + 1) * self.flags_width + x + 1]
+
+    #---------------------------------------------------------------------------
+    #      Method: get_flags_at
+    #
+    # Description: Given the pixel coordinates for a location, returns the flag
+    #              bits (TILE_SOLID, TILE_ICY, etc.) of the corresponding cell.
+    #
+    #      Inputs: x - Horizontal coordinate, measured in pixels.
+    #              y - Vertical coordinate, measured in pixels.
+    #
+    #     Outputs: Flag bits for the location in question (TILE_NON_SOLID if
+    #              the coordinates are invalid).
+    #---------------------------------------------------------------------------
+    def get_flags_at(self, x, y):
+        x //= MAP_TILE_SIZE
+        y //= MAP_TILE_SIZE
+        if x < 0:
+            x = -1
+        elif x > self.map_width:
+            x = self.map_width
+        if y < 0:
+            y = -1
+        elif y > self.map_height:
+            y = self.map_height
+        return self.flags[(y + 1) * self.flags_width + x + 1]
+
     #---------------------------------------------------------------------------
     #      Method: is_solid_at
     #
@@ -137,8 +216,7 @@ class Map:
     #     Outputs: 'True' if the location is solid.
     #---------------------------------------------------------------------------
     def is_solid_at(self, x, y):
-        tile_num = self.get_tile_number_at(x, y)
-        return tile_num in SOLID_TILES
+        return (self.get_flags_at(x, y) & TILE_SOLID) != 0
 
     #---------------------------------------------------------------------------
     #      Method: is_non_solid_at
@@ -152,31 +230,458 @@ class Map:
     #     Outputs: 'True' if the location is non-solid.
     #---------------------------------------------------------------------------
     def is_non_solid_at(self, x, y):
-        tile_num = self.get_tile_number_at(x, y)
-        return tile_num in NON_SOLID_TILES or tile_num == -1
+        return (self.get_flags_at(x, y) & TILE_NON_SOLID) != 0
+
+    #---------------------------------------------------------------------------
+    #      Method: get_chunk
+    #
+    # Description: Returns a pre-rendered chunk of the map, rendering it first
+    #              if it isn't cached. The least recently used chunk is evicted
+    #              whenever the cache grows too large.
+    #
+    #      Inputs: chunk_x - Horizontal coordinate, measured in chunks.
+    #              chunk_y - Vertical coordinate, measured in chunks.
+    #
+    #     Outputs: Surface containing the chunk's tiles.
+    #---------------------------------------------------------------------------
+    def get_chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.render_chunk(chunk_x, chunk_y)
+            self.chunks[key] = chunk
+            if len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        return chunk
+
+    #---------------------------------------------------------------------------
+    #      Method: render_chunk
+    #
+    # Description: Draws a square block of MAP_CHUNK_SIZE x MAP_CHUNK_SIZE
+    #              tiles, over the background color, onto a new surface.
+    #
+    #      Inputs: chunk_x - Horizontal coordinate, measured in chunks.
+    #              chunk_y - Vertical coordinate, measured in chunks.
+    #
+    #     Outputs: Surface containing the chunk's tiles.
+    #---------------------------------------------------------------------------
+    def render_chunk(self, chunk_x, chunk_y):
+        chunk = pygame.Surface((self.chunk_pixels, self.chunk_pixels))
+        if display.get_surface() is not None:
+            chunk = chunk.convert()
+        chunk.fill(self.bg_color)
+        first_x = chunk_x * MAP_CHUNK_SIZE
+        first_y = chunk_y * MAP_CHUNK_SIZE
+        sprites = []
+        for y in range(MAP_CHUNK_SIZE):
+            map_y = min(first_y + y, self.map_height - 1) # as in 'get_tile'
+            for x in range(MAP_CHUNK_SIZE):
+                sprite = self.tiles.get_sprite(
+                    self.get_tile_number(first_x + x, map_y),
+                    (x * MAP_TILE_SIZE, y * MAP_TILE_SIZE))
+                if sprite is not None:
+                    sprites.append(sprite)
+        chunk.blits(sprites, doreturn=False)
+        return chunk
+
+    #---------------------------------------------------------------------------
+    #      Method: prepare_view
+    #
+    # Description: Renders, ahead of time, every chunk that 'draw' would need
+    #              for a given position, so that the first frame drawn there
+    #              only copies pre-rendered chunks. Meant for maps that aren't
+    #              in use yet (e.g., on a background thread).
+    #
+    #      Inputs: left_col - Pixel coordinate for first column to draw.
+    #              top_row  - Pixel coordinate for first row to draw.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def prepare_view(self, left_col, top_row):
+        left = math.floor(left_col) + MAP_TILE_SIZE # as in 'draw'
+        top = math.floor(top_row) + MAP_TILE_SIZE
+        last_chunk_x = min((left + self.screen_width - 1) // self.chunk_pixels,
+                           (self.map_width - 1) // MAP_CHUNK_SIZE)
+        last_chunk_y = (top + self.screen_height - 1) // self.chunk_pixels
+        for chunk_y in range(max(top // self.chunk_pixels, 0),
+                             last_chunk_y + 1):
+            for chunk_x in range(max(left // self.chunk_pixels, 0),
+                                 last_chunk_x + 1):
+                self.get_chunk(chunk_x, chunk_y)
 
     #---------------------------------------------------------------------------
     #      Method: draw
     #
-    # Description: Draws the currently-visible part of the map onto the screen.
+    # Description: Queues the currently-visible part of the map for drawing
+    #              by way of a back-buffer that persists between frames. When
+    #              the view moves by less than a screen, the back-buffer's
+    #              contents are scrolled and only the newly exposed strips are
+    #              drawn; otherwise (e.g., on the first frame of a level) all
+    #              of it is drawn.
     #
     #      Inputs: left_col - Pixel coordinate for first column to draw.
     #              top_row  - Pixel coordinate for first row to draw.
+    #              queue    - 'RenderQueue' to which the back-buffer is
+    #                         added.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
-    def draw(self, left_col, top_row):
-        self.screen.fill(self.bg_color)
-        top_left_tile_x = left_col // MAP_TILE_SIZE
-        top_left_tile_y = top_row  // MAP_TILE_SIZE
-        pixel_offset_x = left_col % MAP_TILE_SIZE
-        pixel_offset_y = top_row  % MAP_TILE_SIZE
-        for screen_y in range(self.screen_height // MAP_TILE_SIZE + 2):
-            map_y = screen_y + top_left_tile_y + 1
-            for screen_x in range(self.screen_width // MAP_TILE_SIZE + 1):
-                map_x = screen_x + top_left_tile_x + 1
-                tile = self.get_tile(map_x, map_y)
-                if tile:
-                    position = ((screen_x * MAP_TILE_SIZE) - pixel_offset_x,
-                                (screen_y * MAP_TILE_SIZE) - pixel_offset_y)
-                    self.screen.blit(tile, position)
+    def draw(self, left_col, top_row, queue):
+        # map pixel (x, y) appears on screen at (x - MAP_TILE_SIZE - left_col,
+        # y - MAP_TILE_SIZE - top_row)
+        left = math.floor(left_col) + MAP_TILE_SIZE
+        top = math.floor(top_row) + MAP_TILE_SIZE
+        (width, height) = (self.screen_width, self.screen_height)
+        if self.view is None:
+            self.view = pygame.Surface((width, height))
+            if display.get_surface() is not None:
+                self.view = self.view.convert()
+            self.view_position = None
+        if self.view_position is None:
+            self._draw_region(left, top, pygame.Rect(0, 0, width, height))
+        else:
+            dx = left - self.view_position[0]
+            dy = top - self.view_position[1]
+            if abs(dx) >= width or abs(dy) >= height:
+                self._draw_region(left, top, pygame.Rect(0, 0, width, height))
+            elif dx or dy:
+                self.view.scroll(-dx, -dy)
+                if dx > 0:
+                    self._draw_region(left, top, pygame.Rect(width - dx, 0,
+                                                             dx, height))
+                elif dx < 0:
+                    self._draw_region(left, top, pygame.Rect(0, 0, -dx,
+                                                             height))
+                if dy > 0:
+                    self._draw_region(left, top, pygame.Rect(0, height - dy,
+                                                             width, dy))
+                elif dy < 0:
+                    self._draw_region(left, top, pygame.Rect(0, 0, width,
+                                                             -dy))
+        self.view_position = (left, top)
+        queue.add(self.view, (0, 0), layer=RENDER_LAYER_MAP)
+
+    #---------------------------------------------------------------------------
+    #      Method: is_view_at
+    #
+    # Description: Determines whether the back-buffer already shows what 'draw'
+    #              would for a given position, so nothing needs drawing.
+    #
+    #      Inputs: left_col - Pixel coordinate for first column to draw.
+    #              top_row  - Pixel coordinate for first row to draw.
+    #
+    #     Outputs: 'True' if the back-buffer is up to date.
+    #---------------------------------------------------------------------------
+    def is_view_at(self, left_col, top_row):
+        return (self.view is not None and
+                self.view_position == (math.floor(left_col) + MAP_TILE_SIZE,
+                                       math.floor(top_row) + MAP_TILE_SIZE))
+
+    #---------------------------------------------------------------------------
+    #      Method: restore
+    #
+    # Description: Queues a copy of part of the back-buffer, as last drawn,
+    #              erasing whatever was drawn over that part of the screen
+    #              since.
+    #
+    #      Inputs: rect  - Area of the screen to restore.
+    #              queue - 'RenderQueue' to which the copy is added.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def restore(self, rect, queue):
+        queue.add(self.view, rect.topleft, rect, RENDER_LAYER_MAP)
+
+    #---------------------------------------------------------------------------
+    #      Method: reuse_view
+    #
+    # Description: Takes over the back-buffer of a map this one replaces (so
+    #              only one is ever kept), to be drawn afresh on next use.
+    #
+    #      Inputs: other - The map being replaced.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def reuse_view(self, other):
+        if other is self or other.view is None:
+            return
+        (self.view, other.view) = (other.view, None)
+        self.view_position = None
+
+    #---------------------------------------------------------------------------
+    #      Method: _draw_region
+    #
+    # Description: Draws part of the back-buffer afresh, from pre-rendered
+    #              chunks.
+    #
+    #      Inputs: left - Map pixel coordinate shown at the back-buffer's left
+    #                     edge.
+    #              top  - Map pixel coordinate shown at the back-buffer's top
+    #                     edge.
+    #              rect - Area of the back-buffer to draw.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _draw_region(self, left, top, rect):
+        view = self.view
+        view.set_clip(rect)
+        view.fill(self.bg_color, rect)
+        first_chunk_x = max((left + rect.left) // self.chunk_pixels, 0)
+        last_chunk_x = min((left + rect.right - 1) // self.chunk_pixels,
+                           (self.map_width - 1) // MAP_CHUNK_SIZE)
+        first_chunk_y = max((top + rect.top) // self.chunk_pixels, 0)
+        last_chunk_y = (top + rect.bottom - 1) // self.chunk_pixels
+        view.blits([(self.get_chunk(chunk_x, chunk_y),
+                     (chunk_x * self.chunk_pixels - left,
+                      chunk_y * self.chunk_pixels - top))
+                    for chunk_y in range(first_chunk_y, last_chunk_y + 1)
+                    for chunk_x in range(first_chunk_x, last_chunk_x + 1)],
+                   doreturn=False)
+        view.set_clip(None)
+
+    #---------------------------------------------------------------------------
+    #      Method: stream
+    #
+    # Description: Keeps the chunks of a streamed map that lie near a given
+    #              location in memory. Chunks within MAP_STREAM_MARGIN tiles of
+    #              the screen are loaded at once, if they weren't paged in
+    #              already, so characters that may be active always collide
+    #              with exact tiles; chunks up to MAP_STREAM_PREFETCH chunks
+    #              farther out are paged in on a background thread, and those
+    #              beyond that (plus one chunk, to avoid thrashing) are
+    #              evicted. Does nothing for other maps.
+    #
+    #      Inputs: x - Horizontal coordinate of the screen's center, measured
+    #                  in pixels (e.g., the player's position).
+    #              y - Vertical coordinate of the screen's center, measured in
+    #                  pixels.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def stream(self, x, y):
+        if self.stream_level is None:
+            return
+        size = self.stream_level.chunk_size
+        margin_x = self.screen_width // (2 * MAP_TILE_SIZE) + MAP_STREAM_MARGIN
+        margin_y = (self.screen_height // (2 * MAP_TILE_SIZE) +
+                    MAP_STREAM_MARGIN)
+        (tile_x, tile_y) = (int(x) // MAP_TILE_SIZE, int(y) // MAP_TILE_SIZE)
+        (last_chunk_x, last_chunk_y) = (self.stream_level.chunks_x - 1,
+                                        self.stream_level.chunks_y - 1)
+        first_x = max((tile_x - margin_x) // size, 0)
+        last_x = min((tile_x + margin_x + 1) // size, last_chunk_x)
+        first_y = max((tile_y - margin_y) // size, 0)
+        last_y = min((tile_y + margin_y + 1) // size, last_chunk_y)
+        if (first_x, first_y, last_x, last_y) == self.stream_range:
+            return
+        self.stream_range = (first_x, first_y, last_x, last_y)
+
+        for chunk_y in range(first_y, last_y + 1):
+            for chunk_x in range(first_x, last_x + 1):
+                self._get_stream_chunk((chunk_x, chunk_y))
+        prefetch = MAP_STREAM_PREFETCH
+        for chunk_y in range(max(first_y - prefetch, 0),
+                             min(last_y + prefetch, last_chunk_y) + 1):
+            for chunk_x in range(max(first_x - prefetch, 0),
+                                 min(last_x + prefetch, last_chunk_x) + 1):
+                key = (chunk_x, chunk_y)
+                if key not in self.resident and key not in self.pending:
+                    self.pending.add(key)
+                    stream_executor.submit(self._page_in, key)
+        keep = prefetch + 1
+        for key in list(self.resident): # may grow on the background thread
+            if not (first_x - keep <= key[0] <= last_x + keep and
+                    first_y - keep <= key[1] <= last_y + keep):
+                del self.resident[key]
+
+    #---------------------------------------------------------------------------
+    #      Method: _build_flags
+    #
+    # Description: Precomputes a flat array of flag bits for every map cell,
+    #              surrounded by a one-cell border of out-of-bounds cells, so
+    #              each collision query is a single indexed read.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _build_flags(self):
+        self.flags_width = self.map_width + 2
+        self.flags = bytearray([get_tile_flags(-1)]) * (self.flags_width *
+                                                        (self.map_height + 2))
+        flags_by_tile = {}
+        for y in range(self.map_height):
+            i = (y + 1) * self.flags_width + 1
+            for x in range(self.map_width):
+                tile_num = self.map[y * self.map_width + x]
+                flags = flags_by_tile.get(tile_num)
+                if flags is None:
+                    flags = flags_by_tile[tile_num] = get_tile_flags(tile_num)
+                self.flags[i + x] = flags
+
+    #---------------------------------------------------------------------------
+    #      Method: _open_stream
+    #
+    # Description: Opens a chunked level file for streaming, replaces the tile
+    #              and flag lookups with streamed versions, and loads the
+    #              chunks around the player's starting location.
+    #
+    #      Inputs: filename - Name of a chunked level file.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _open_stream(self, filename):
+        self.stream_level = chunked_level.ChunkedLevel(filename)
+        self.map_width = self.stream_level.width
+        self.map_height = self.stream_level.height
+        self.map = None
+        self.flags = None # no flat array of flags (see 'NPCStore._flags')
+        self.flags_width = None
+        self.resident = {} # (chunk_x, chunk_y) -> (tile numbers, flags)
+        self.pending = set() # chunks waiting to be paged in
+        self.stream_range = None # chunks that must stay resident
+        self.flags_by_tile = {}
+        self.border_flags = get_tile_flags(-1)
+        self.get_tile_number = self._get_streamed_tile_number
+        self.get_flags = self._get_streamed_flags
+        self.get_flags_at = self._get_streamed_flags_at
+        self.stream(*self.player_start_location)
+
+    #---------------------------------------------------------------------------
+    #      Method: _get_stream_chunk
+    #
+    # Description: Returns a chunk of a streamed map, loading it first if it
+    #              isn't resident.
+    #
+    #      Inputs: key - Tuple of the chunk's coordinates, measured in chunks.
+    #
+    #     Outputs: A tuple containing the chunk's tile numbers and flags.
+    #---------------------------------------------------------------------------
+    def _get_stream_chunk(self, key):
+        chunk = self.resident.get(key)
+        if chunk is None:
+            chunk = self.resident[key] = self._read_stream_chunk(key)
+        return chunk
+
+    #---------------------------------------------------------------------------
+    #      Method: _read_stream_chunk
+    #
+    # Description: Decodes a chunk of a streamed map and computes its flags.
+    #              Safe to call from any thread.
+    #
+    #      Inputs: key - Tuple of the chunk's coordinates, measured in chunks.
+    #
+    #     Outputs: A tuple containing the chunk's tile numbers and flags, each
+    #              indexed as 'y * chunk_size + x'.
+    #---------------------------------------------------------------------------
+    def _read_stream_chunk(self, key):
+        tiles = self.stream_level.read_chunk(*key)
+        flags = bytearray(len(tiles))
+        flags_by_tile = self.flags_by_tile
+        for (i, tile_num) in enumerate(tiles):
+            tile_flags = flags_by_tile.get(tile_num)
+            if tile_flags is None:
+                tile_flags = flags_by_tile[tile_num] = get_tile_flags(tile_num)
+            flags[i] = tile_flags
+        return (tiles, flags)
+
+    #---------------------------------------------------------------------------
+    #      Method: _page_in
+    #
+    # Description: Loads a chunk of a streamed map on the background thread.
+    #
+    #      Inputs: key - Tuple of the chunk's coordinates, measured in chunks.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _page_in(self, key):
+        try:
+            if key not in self.resident:
+                self.resident[key] = self._read_stream_chunk(key)
+        finally:
+            self.pending.discard(key)
+
+    #---------------------------------------------------------------------------
+    #      Method: _get_streamed_tile_number
+    #
+    # Description: 'get_tile_number' for streamed maps. Chunks that aren't
+    #              resident are loaded, so tiles are always drawn exactly.
+    #
+    #      Inputs: x - Horizontal coordinate, measured in tile blocks.
+    #              y - Vertical coordinate, measured in tile blocks.
+    #
+    #     Outputs: Tile number for the location in question (or -1 if the
+    #              coordinates are invalid).
+    #---------------------------------------------------------------------------
+    def _get_streamed_tile_number(self, x, y):
+        if x < 0 or y < 0 or x >= self.map_width or y >= self.map_height:
+            return -1
+        size = self.stream_level.chunk_size
+        tiles = self._get_stream_chunk((x // size, y // size))[0]
+        return tiles[(y % size) * size + x % size]
+
+    #---------------------------------------------------------------------------
+    #      Method: _get_streamed_flags
+    #
+    # Description: 'get_flags' for streamed maps. Cells of chunks that aren't
+    #              resident get the flags of the level's coarse solidity
+    #              summary (see 'ChunkedLevel.get_coarse_flags').
+    #
+    #      Inputs: x - Horizontal coordinate, measured in tile blocks.
+    #              y - Vertical coordinate, measured in tile blocks.
+    #
+    #     Outputs: Flag bits for the location in question (TILE_NON_SOLID if
+    #              the coordinates are invalid).
+    #---------------------------------------------------------------------------
+    def _get_streamed_flags(self, x, y):
+        if x < 0 or y < 0 or x >= self.map_width or y >= self.map_height:
+            return self.border_flags
+        size = self.stream_level.chunk_size
+        chunk = self.resident.get((x // size, y // size))
+        if chunk is None:
+            return self.stream_level.get_coarse_flags(x, y)
+        return chunk[1][(y % size) * size + x % size]
+
+    #---------------------------------------------------------------------------
+    #      Method: _get_streamed_flags_at
+    #
+    # Description: 'get_flags_at' for streamed maps.
+    #
+    #      Inputs: x - Horizontal coordinate, measured in pixels.
+    #              y - Vertical coordinate, measured in pixels.
+    #
+    #     Outputs: Flag bits for the location in question (TILE_NON_SOLID if
+    #              the coordinates are invalid).
+    #---------------------------------------------------------------------------
+    def _get_streamed_flags_at(self, x, y):
+        return self._get_streamed_flags(x // MAP_TILE_SIZE, y // MAP_TILE_SIZE)
+
+#-------------------------------------------------------------------------------
+#    Function: get_tile_flags
+#
+# Description: Determines the flag bits describing a given tile number.
+#
+#      Inputs: tile_num - Tile number of interest (-1 for an empty tile).
+#
+#     Outputs: Combination of TILE_SOLID, TILE_TOP_SOLID, TILE_NON_SOLID,
+#              TILE_ICY, TILE_CLIMBABLE, TILE_HAZARD, and TILE_EXIT.
+#-------------------------------------------------------------------------------
+def get_tile_flags(tile_num):
+    flags = 0
+    if tile_num in SOLID_TILES:
+        flags |= TILE_SOLID
+    if tile_num in TOP_SOLID_TILES:
+        flags |= TILE_TOP_SOLID
+    if tile_num in NON_SOLID_TILES or tile_num == -1:
+        flags |= TILE_NON_SOLID
+    if tile_num in ICY_TILES:
+        flags |= TILE_ICY
+    if tile_num in CLIMBABLE_TILES:
+        flags |= TILE_CLIMBABLE
+    if tile_num == SPIKE_TILE:
+        flags |= TILE_HAZARD
+    if tile_num == OPEN_DOOR:
+        flags |= TILE_EXIT
+    return flags
@@ -1,92 +1,201 @@
-#!/usr/bin/python2
+#!/usr/bin/python
 
-from xml import dom.minidom
-import base64
-import zlib
+#-------------------------------------------------------------------------------
+#    Filename: convert_map.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Converts Tiled TMX maps into the text '.map' format (a Python
+#              list of rows of tile numbers) or, given a '.lvl' or '.lvc'
+#              output name, the binary or chunked level format (the latter for
+#              levels to be streamed). Either one file or, with '--batch',
+#              whole directories are converted, the latter in parallel and
+#              skipping maps whose output is already up to date.
+#-------------------------------------------------------------------------------
+
+import argparse
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-if len(sys.argv) != 3:
-    print('Usage:', sys.argv[0], '<in> <out>')
-    sys.exit(-1)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import chunked_level
+import level_file
+import map
+import tmx_file
+from config import MAP_STREAM_CHUNK_SIZE, MAP_STREAM_COARSE_SIZE
 
-# parse XML document
-dom = minidom.parse(sys.argv[1])
+BATCH_CHUNK_SIZE = 4 # maps handed to a worker process at a time
 
-# pick it apart and do some basic validation
-mapelt = dom.getElementsByTagName('map')[0]
-if mapelt.getAttribute('orientation') != 'orthogonal':
-    print('orientation must be orthogonal, not',
-          mapelt.getAttribute('orientation'))
-    sys.exit(-1)
-height = int(mapelt.getAttribute('height'))
-width = int(mapelt.getAttribute('width'))
-if height < 1 or width < 1:
-    print('map is too small:', width, 'x', height)
-    sys.exit(-1)
+#-------------------------------------------------------------------------------
+#    Function: convert_map
+#
+# Description: Converts one TMX map.
+#
+#      Inputs: in_filename  - Name of the TMX file.
+#              out_filename - Name of the file to write: a binary level file if
+#                             it ends in '.lvl', a chunked level file if it
+#                             ends in '.lvc', a text map otherwise.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def convert_map(in_filename, out_filename):
+    with open(in_filename, 'rb') as fileIn:
+        (width, height, tiles) = tmx_file.parse_tmx(fileIn.read(),
+                                                    in_filename)
+    if out_filename.endswith('.lvl'):
+        level_file.save_level(out_filename, width, height, tiles)
+    elif out_filename.endswith('.lvc'):
+        chunked_level.save_level(out_filename, width, height, tiles,
+                                 MAP_STREAM_CHUNK_SIZE, MAP_STREAM_COARSE_SIZE,
+                                 map.get_tile_flags)
+    else:
+        write_text_map(out_filename, width, height, tiles)
 
-# get tileset info
-tileset = mapelt.getElementsByTagName('tileset')[0]
-firstgid = int(tileset.getAttribute('firstgid'))
+#-------------------------------------------------------------------------------
+#    Function: write_text_map
+#
+# Description: Writes tile numbers as a text '.map' file, in a single write.
+#
+#      Inputs: filename - Name of the file to write.
+#              width    - Map width, in tiles.
+#              height   - Map height, in tiles.
+#              tiles    - Flat, row-major sequence of tile numbers.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def write_text_map(filename, width, height, tiles):
+    row_format = '    [' + '%3d,' * width + ' ],\n'
+    lines = ['[\n']
+    for y in range(height):
+        lines.append(row_format % tuple(tiles[y * width:(y + 1) * width]))
+    lines.append(']\n')
+    with open(filename, 'w') as fileOut:
+        fileOut.write(''.join(lines))
 
-# get actual map data
-layers = mapelt.getElementsByTagName('layer')
-if len(layers) != 1:
-    print('map must contain exactly one layer, not', len(layers))
-    sys.exit(-1)
-layer = layers[0]
-if int(layer.getAttribute('height')) != height:
-    print('layer height =', int(layer.getAttribute('height')),
-          'does not match map height =', height)
-    sys.exit(-1)
-if int(layer.getAttribute('width')) != width:
-    print('layer width =', int(layer.getAttribute('width')),
-          'does not match map width =', width)
-    sys.exit(-1)
-data = layer.getElementsByTagName('data')[0]
-if data.getAttribute('encoding') != 'base64':
-    print('layer data must use base64 encoding, not',
-          data.getAttribute('encoding'))
-    sys.exit(-1)
-zlibtype = data.getAttribute('compression')
-if zlibtype not in ['gzip', 'zlib']:
-    print('layer data must use gzip or zlib compression, not',
-          data.getAttribute('compression'))
-    sys.exit(-1)
-data.normalize()
-base64_gzip_elt = data.firstChild.data
+#-------------------------------------------------------------------------------
+#    Function: is_up_to_date
+#
+# Description: Determines whether an output file is newer than its TMX file.
+#
+#      Inputs: in_filename  - Name of the TMX file.
+#              out_filename - Name of the output file.
+#
+#     Outputs: 'True' if the output exists and needn't be converted again.
+#-------------------------------------------------------------------------------
+def is_up_to_date(in_filename, out_filename):
+    try:
+        return (os.path.getmtime(out_filename) >=
+                os.path.getmtime(in_filename))
+    except OSError:
+        return False
 
-# unencode the data
-gzip_elt = base64.standard_b64decode(base64_gzip_elt)
-if zlibtype == 'gzip':
-    elt = zlib.decompress(gzip_elt[10:], -zlib.MAX_WBITS)
-elif zlibtype == 'zlib':
-    elt = zlib.decompress(gzip_elt)
+#-------------------------------------------------------------------------------
+#    Function: convert_job
+#
+# Description: Converts one map in a worker process, reporting failures
+#              instead of raising them.
+#
+#      Inputs: filenames - Tuple of input and output file names.
+#
+#     Outputs: 'None' on success, otherwise an error message.
+#-------------------------------------------------------------------------------
+def convert_job(filenames):
+    (in_filename, out_filename) = filenames
+    try:
+        convert_map(in_filename, out_filename)
+    except (OSError, ValueError, OverflowError) as error:
+        return '%s: %s' % (in_filename, error)
+    return None
 
-if len(elt) != 4 * width * height:
-    print('map data is the wrong size: found', len(elt), 'but expected',
-          (4 * width * height))
-    sys.exit(-1)
+#-------------------------------------------------------------------------------
+#    Function: convert_batch
+#
+# Description: Converts every TMX map in the given directories.
+#
+#      Inputs: directories - Directories to search (not recursively).
+#              out_dir     - Directory for output files ('None' to write each
+#                            next to its map).
+#              extension   - Extension of output files ('.map', '.lvl', or
+#                            '.lvc').
+#              jobs        - Number of worker processes ('None' for one per
+#                            CPU).
+#              force       - 'True' to convert maps that are up to date.
+#
+#     Outputs: A tuple containing the numbers of maps converted and skipped,
+#              and a list of error messages.
+#-------------------------------------------------------------------------------
+def convert_batch(directories, out_dir=None, extension='.map', jobs=None,
+                  force=False):
+    pending = []
+    skipped = 0
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.tmx'):
+                continue
+            in_filename = os.path.join(directory, name)
+            out_filename = os.path.join(out_dir or directory,
+                                        name[:-len('.tmx')] + extension)
+            if not force and is_up_to_date(in_filename, out_filename):
+                skipped += 1
+            else:
+                pending.append((in_filename, out_filename))
+    if out_dir and pending:
+        os.makedirs(out_dir, exist_ok=True)
+    if jobs == 1 or len(pending) < 2:
+        errors = [convert_job(filenames) for filenames in pending]
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            errors = list(executor.map(convert_job, pending,
+                                       chunksize=BATCH_CHUNK_SIZE))
+    errors = [error for error in errors if error is not None]
+    return (len(pending) - len(errors), skipped, errors)
 
-map = []
-for y in range(height):
-    line = []
-    for x in range(width):
-        i = 4 * (y * width + x)
-        n =  ord(elt[i])
-        n += ord(elt[i+1]) * 0x100
-        n += ord(elt[i+2]) * 0x10000
-        n += ord(elt[i+3]) * 0x1000000
-        n -= firstgid
-        line.append(n)
-    map.append(line)
+#-------------------------------------------------------------------------------
+#    Function: main
+#
+# Description: Converts the maps named on the command line.
+#
+#      Inputs: None, but options are read from the command line.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert Tiled TMX maps for Toad\'s Adventure.')
+    parser.add_argument('paths', nargs='+',
+                        help='<in.tmx> <out> or, with --batch, directories')
+    parser.add_argument('--batch', action='store_true',
+                        help='convert every TMX map in the given directories')
+    parser.add_argument('--out-dir', metavar='DIR',
+                        help='write batch output to DIR')
+    parser.add_argument('--format', choices=('map', 'lvl', 'lvc'),
+                        default='map',
+                        help='batch output format (default: map)')
+    parser.add_argument('--jobs', type=int, metavar='N',
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true',
+                        help='convert maps even if their output is up to date')
+    args = parser.parse_args()
+    if not args.batch:
+        if len(args.paths) != 2:
+            parser.error('expected <in> <out> (or --batch)')
+        try:
+            convert_map(args.paths[0], args.paths[1])
+        except (ValueError, OverflowError) as error:
+            print(error)
+            sys.exit(-1)
+        return
+    (converted, skipped, errors) = convert_batch(args.paths, args.out_dir,
+                                                 '.' + args.format, args.jobs,
+                                                 args.force)
+    for error in errors:
+        print(error)
+    print('%d converted, %d up to date, %d failed' % (converted, skipped,
+                                                      len(errors)))
+    if errors:
+        sys.exit(-1)
 
-# dump output
-fp = open(sys.argv[2], 'w')
-fp.write('[\n')
-for line in map:
-    fp.write('    [')
-    for n in line:
-        fp.write('%3d,' % n)
-    fp.write(' ],\n')
-fp.write(']\n')
-fp.close()
+if __name__ == '__main__':
+    main()
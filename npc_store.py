@@ -0,0 +1,675 @@
+#-------------------------------------------------------------------------------
+#    Filename: npc_store.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Provides a struct-of-arrays alternative to a list of
+#              'NonPlayerCharacter' objects for Toad's Adventure. Requires
+#              NumPy.
+#-------------------------------------------------------------------------------
+
+import re
+import numpy as np
+import characters
+from config import *
+
+# per-NPC fields kept in arrays, with their NumPy and Python types
+NPC_FIELDS = [('ID', np.int64, int),
+              ('x', np.int64, int),
+              ('y', np.int64, int),
+              ('prev_x', np.int64, int),
+              ('prev_y', np.int64, int),
+              ('dx', np.float64, float),
+              ('dy', np.float64, float),
+              ('max_speed_x', np.float64, float),
+              ('max_speed_y', np.float64, float),
+              ('accel_rate', np.float64, float),
+              ('first_tile', np.int64, int),
+              ('stances', np.int64, int),
+              ('width_offset', np.int64, int),
+              ('height_offset', np.int64, int),
+              ('current_stance', np.int64, int),
+              ('pixels_moved', np.int64, int),
+              ('num_stance_changes', np.int64, int),
+              ('facing_right', np.bool_, bool),
+              ('is_flying', np.bool_, bool),
+              ('is_active', np.bool_, bool)]
+
+#-------------------------------------------------------------------------------
+#    Function: _state_dtype
+#
+# Description: Builds a NumPy structured type matching a little-endian
+#              'struct' format with one value per field.
+#
+#      Inputs: format - The 'struct' format (e.g., '<h4i?').
+#              fields - Name of each field, in order.
+#
+#     Outputs: A 'numpy.dtype'.
+#-------------------------------------------------------------------------------
+def _state_dtype(format, fields):
+    codes = {'h': '<i2', 'i': '<i4', 'd': '<f8', '?': '?'}
+    types = []
+    for (count, code) in re.findall(r'(\d*)([a-z?])', format.lstrip('<')):
+        types.extend([codes[code]] * int(count or 1))
+    return np.dtype(list(zip(fields, types)))
+
+# packed layout of each NPC's state (see 'NonPlayerCharacter.get_state')
+NPC_STATE_DTYPE = _state_dtype(characters.NonPlayerCharacter.STATE.format,
+                               characters.NonPlayerCharacter.STATE_FIELDS)
+
+#-------------------------------------------------------------------------------
+#       Class: NPCStore
+#
+# Description: Keeps the state of every NPC in a level in NumPy arrays and
+#              updates all active NPCs at once, with results identical to
+#              calling 'NonPlayerCharacter.game_logic' on each. Iterating over
+#              the store yields an 'NPCView' per NPC, which may be used like a
+#              'NonPlayerCharacter' (drawing, overlap tests, bumping, etc.).
+#
+#     Methods: __init__, __len__, __iter__, remove_fallen, update_activation,
+#              game_logic, get_overlapping, get_overlapping_pairs, bump_pairs,
+#              get_state, set_state, _get_bounds, _flags_at, _flags,
+#              _is_colliding, _sweep
+#-------------------------------------------------------------------------------
+class NPCStore:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Copies the state of a list of NPCs into arrays.
+    #
+    #      Inputs: NPCs   - List of 'NonPlayerCharacter' objects.
+    #              tiles  - Tileset used by all game characters.
+    #              map    - The current map/level.
+    #              screen - The screen on which the game is displayed.
+    #              clock  - 'GameClock' measuring the game's time.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, NPCs, tiles, map, screen, clock):
+        self.tiles = tiles
+        self.map = map
+        self.screen = screen
+        self.clock = clock
+        self.arrays = {}
+        for (name, dtype, _) in NPC_FIELDS:
+            self.arrays[name] = np.array([getattr(NPC, name) for NPC in NPCs],
+                                         dtype=dtype)
+        self.views = [NPCView(self, i) for i in range(len(NPCs))]
+
+        # collision flags shared with the map (see 'Map.get_flags'), unless
+        # it's streamed
+        self.flags = None
+        if map.flags is not None:
+            self.flags = np.frombuffer(map.flags, dtype=np.uint8)
+
+    #---------------------------------------------------------------------------
+    #      Method: get_state
+    #
+    # Description: Packs the state of every NPC into bytes, laid out exactly as
+    #              'NonPlayerCharacter.get_state' would pack each in turn.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: A bytes object.
+    #---------------------------------------------------------------------------
+    def get_state(self):
+        state = np.zeros(len(self.views), dtype=NPC_STATE_DTYPE)
+        for name in self.arrays:
+            state[name] = self.arrays[name]
+        return state.tobytes()
+
+    #---------------------------------------------------------------------------
+    #      Method: set_state
+    #
+    # Description: Replaces every NPC with those packed by 'get_state' (or by
+    #              'NonPlayerCharacter.get_state').
+    #
+    #      Inputs: data - Bytes-like object holding the state.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def set_state(self, data):
+        state = np.frombuffer(data, dtype=NPC_STATE_DTYPE)
+        for (name, dtype, _) in NPC_FIELDS:
+            self.arrays[name] = state[name].astype(dtype)
+        if len(self.views) != len(state):
+            self.views = [NPCView(self, i) for i in range(len(state))]
+
+    #---------------------------------------------------------------------------
+    #      Method: __len__
+    #
+    # Description: Returns the number of NPCs in the store.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: Number of NPCs.
+    #---------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.views)
+
+    #---------------------------------------------------------------------------
+    #      Method: __iter__
+    #
+    # Description: Iterates over views of each NPC.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: Iterator of 'NPCView' objects.
+    #---------------------------------------------------------------------------
+    def __iter__(self):
+        return iter(self.views)
+
+    #---------------------------------------------------------------------------
+    #      Method: remove_fallen
+    #
+    # Description: Removes NPCs that have fallen below a given height.
+    #
+    #      Inputs: fall_limit - Lowest y-coordinate an NPC may have.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def remove_fallen(self, fall_limit):
+        keep = self.arrays['y'] <= fall_limit
+        if keep.all():
+            return
+        for name in self.arrays:
+            self.arrays[name] = self.arrays[name][keep]
+        self.views = [view for (view, kept) in zip(self.views, keep) if kept]
+        for (i, view) in enumerate(self.views):
+            view.index = i
+
+    #---------------------------------------------------------------------------
+    #      Method: update_activation
+    #
+    # Description: Wakes NPCs within a wake margin of a region and freezes those
+    #              beyond a (larger) sleep margin.
+    #
+    #      Inputs: left, top,   - Pixel coordinates bounding the region.
+    #              right, bottom
+    #              wake_margin  - Margin within which inactive NPCs wake.
+    #              sleep_margin - Margin beyond which active NPCs freeze.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def update_activation(self, left, top, right, bottom, wake_margin,
+                          sleep_margin):
+        a = self.arrays
+        (x, y, was_active) = (a['x'], a['y'], a['is_active'])
+        margin = np.where(was_active, sleep_margin, wake_margin)
+        is_active = ((left - margin <= x) & (x <= right + margin) &
+                     (top - margin <= y) & (y <= bottom + margin))
+        frozen = was_active & ~is_active # no interpolation while frozen
+        a['prev_x'][frozen] = x[frozen]
+        a['prev_y'][frozen] = y[frozen]
+        a['is_active'] = is_active
+
+    #---------------------------------------------------------------------------
+    #      Method: game_logic
+    #
+    # Description: Performs 'NonPlayerCharacter.game_logic' for every active
+    #              NPC using vectorized operations.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def game_logic(self):
+        a = self.arrays
+        active = np.flatnonzero(a['is_active'])
+        if len(active) == 0:
+            return
+        s = dict((name, array[active]) for (name, array) in a.items())
+        (ID, x, y, dx, dy) = (s['ID'], s['x'], s['y'], s['dx'], s['dy'])
+        (wo, flying, facing) = (s['width_offset'], s['is_flying'],
+                                s['facing_right'])
+        map_width = self.map.map_width * MAP_TILE_SIZE
+
+        # check for change in orientation
+        turn = ((facing & self._is_colliding(
+                     x + CHARACTER_TILE_SIZE - wo * 3, y, s, dy)) |
+                (~facing & self._is_colliding(x - 1, y, s, dy)) |
+                (flying & ((~facing & (x - 1 <= 0)) |
+                           (facing & (x + CHARACTER_TILE_SIZE - wo * 2 >=
+                                      map_width)))))
+        blue = ID == SHY_GUY_BLUE
+        if blue.any():
+            bottom = y + CHARACTER_TILE_SIZE + 1
+            edge_flags = np.where(facing,
+                                  self._flags_at(x + CHARACTER_TILE_SIZE + 1,
+                                                 bottom),
+                                  self._flags_at(x, bottom))
+            turn |= (blue & ((edge_flags & TILE_NON_SOLID) != 0) &
+                     self._is_colliding(x, y + 1, s, dy))
+        facing = facing ^ turn
+        dx = np.where(turn, dx * -1.0, dx)
+
+        # horizontal acceleration, starting with friction
+        on_ice = (self._flags_at(x + CHARACTER_TILE_SIZE // 2,
+                                 y + CHARACTER_TILE_SIZE + 1) & TILE_ICY) != 0
+        friction = np.where(on_ice, ICE_FRICTION_PER_FRAME,
+                            DEFAULT_FRICTION_PER_FRAME)
+        positive = ~flying & (dx > 0.0)
+        negative = ~flying & (dx < 0.0)
+        stop = ((positive & (dx - friction < 0.0)) |
+                (negative & (dx + friction > 0.0)))
+        slow = (positive | negative) & ~stop
+        dx = np.where(stop, 0.0, dx)
+        (dx, facing) = push_x(dx, facing, np.where(positive, friction * -1.0,
+                                                   friction),
+                              s['max_speed_x'], slow)
+        accel = np.where(facing, s['accel_rate'] * 1.0,
+                         s['accel_rate'] * 1.0 * -1.0)
+        (dx, facing) = push_x(dx, facing, accel, s['max_speed_x'])
+
+        # vertical acceleration
+        dy = np.where(flying, dy, push_y(dy, GRAVITY_PER_FRAME,
+                                         s['max_speed_y']))
+
+        # apply motion
+        s['prev_x'] = x
+        s['prev_y'] = y
+        abs_x = round_up(np.abs(dx))
+        sign_x = np.where(dx < 0.0, -1, 1)
+        abs_y = round_up(np.abs(dy))
+        sign_y = np.where(dy < 0.0, -1, 1)
+        pixel_count = self._sweep(x, y, s, dy, abs_x, sign_x, True)
+        dx = np.where(pixel_count < abs_x, 0.0, dx)
+        x = x + sign_x * pixel_count
+        distance_y = self._sweep(x, y, s, dy, abs_y, sign_y, False)
+        dy = np.where(distance_y < abs_y, 0.0, dy)
+        y = y + sign_y * distance_y
+
+        # adjust stances as appropriate
+        (stances, stance, moved, changes) = (s['stances'], s['current_stance'],
+                                             s['pixels_moved'],
+                                             s['num_stance_changes'])
+        multi = stances > 1
+        moved = np.where(multi, moved + pixel_count, moved)
+        change = multi & (moved > PIXELS_PER_STANCE_CHANGE)
+        moved = np.where(change, 0, moved)
+        changes = np.where(change, changes + 1, changes)
+        forward = change & (changes < stances)
+        backward = change & ~forward
+        stance = np.where(forward, stance + 1, stance)
+        wrap = forward & (stance >= stances) # error check
+        stance = np.where(wrap, 0, stance)
+        changes = np.where(wrap, 0, changes)
+        ninji_jump = forward & (ID == NINJI)
+        if int(self.clock.get_time()) % 2 and ninji_jump.any():
+            ninji_jump &= self._is_colliding(x, y + 1, s, dy)
+            dy = np.where(ninji_jump, push_y(dy, s['max_speed_y'] * -2,
+                                             s['max_speed_y']), dy)
+        stance = np.where(backward, stance - 1, stance)
+        changes = np.where(backward & (stance == 0), 0, changes)
+        still = multi & (dx == 0.0) # not moving horizontally
+        stance = np.where(still, 0, stance)
+        changes = np.where(still, 0, changes)
+        moved = np.where(still, 0, moved)
+        in_air = (multi & (ID != ALBATOSS) &
+                  ~self._is_colliding(x, y + 1, s, dy))
+        changes = np.where(in_air, 0, changes)
+        moved = np.where(in_air, 0, moved)
+        stance = np.where(in_air & (ID == NINJI), 1, stance)
+
+        # store results
+        (s['x'], s['y'], s['dx'], s['dy'], s['facing_right']) = (x, y, dx, dy,
+                                                                 facing)
+        (s['current_stance'], s['pixels_moved'],
+         s['num_stance_changes']) = (stance, moved, changes)
+        for (name, array) in s.items():
+            a[name][active] = array
+
+    #---------------------------------------------------------------------------
+    #      Method: get_overlapping
+    #
+    # Description: Finds active NPCs overlapping a given character.
+    #
+    #      Inputs: character - The game character of interest.
+    #
+    #     Outputs: List of 'NPCView' objects, in store order.
+    #---------------------------------------------------------------------------
+    def get_overlapping(self, character):
+        (left, top, right, bottom) = self._get_bounds()
+        (other_left, other_top, other_right,
+         other_bottom) = character.get_bounds()
+        overlapping = (self.arrays['is_active'] &
+                       (right >= other_left) & (left <= other_right) &
+                       (top <= other_bottom) & (bottom >= other_top))
+        return [self.views[i] for i in np.flatnonzero(overlapping)]
+
+    #---------------------------------------------------------------------------
+    #      Method: get_overlapping_pairs
+    #
+    # Description: Finds every pair of overlapping active NPCs, using a
+    #              vectorized form of the uniform grid in 'SpatialHash'.
+    #
+    #      Inputs: cell_size - Length of a side of a grid cell, in pixels.
+    #
+    #     Outputs: A tuple of two index arrays (first, second), sorted as
+    #              'SpatialHash.get_pairs' would sort them.
+    #---------------------------------------------------------------------------
+    def get_overlapping_pairs(self, cell_size):
+        active = np.flatnonzero(self.arrays['is_active'])
+        empty = (active[:0], active[:0])
+        if len(active) < 2:
+            return empty
+        (left, top, right, bottom) = [bound[active] for bound in
+                                      self._get_bounds()]
+
+        # list (cell, NPC) entries for every cell each bounding box touches
+        (first_x, last_x) = (left // cell_size, right // cell_size)
+        (first_y, last_y) = (top // cell_size, bottom // cell_size)
+        columns = int((last_x - first_x).max()) + 1
+        rows = int((last_y - first_y).max()) + 1
+        (min_x, min_y) = (first_x.min(), first_y.min())
+        grid_width = int(last_x.max() - min_x) + 1
+        keys = []
+        owners = []
+        for i in range(rows):
+            for j in range(columns):
+                (cell_x, cell_y) = (first_x + j, first_y + i)
+                valid = (cell_x <= last_x) & (cell_y <= last_y)
+                keys.append(((cell_y - min_y) * grid_width +
+                             cell_x - min_x)[valid])
+                owners.append(np.flatnonzero(valid))
+        keys = np.concatenate(keys)
+        owners = np.concatenate(owners)
+        order = np.argsort(keys, kind='stable')
+        (keys, owners) = (keys[order], owners[order])
+
+        # pair up entries sharing a cell, then drop duplicates and misses
+        codes = []
+        offset = 1
+        while offset < len(keys):
+            same = keys[offset:] == keys[:-offset]
+            if not same.any():
+                break
+            (a, b) = (owners[:-offset][same], owners[offset:][same])
+            codes.append(np.minimum(a, b) * len(active) + np.maximum(a, b))
+            offset += 1
+        if not codes:
+            return empty
+        (first, second) = np.divmod(np.unique(np.concatenate(codes)),
+                                    len(active))
+        overlapping = ((right[first] >= left[second]) &
+                       (left[first] <= right[second]) &
+                       (top[first] <= bottom[second]) &
+                       (bottom[first] >= top[second]))
+        return (active[first[overlapping]], active[second[overlapping]])
+
+    #---------------------------------------------------------------------------
+    #      Method: bump_pairs
+    #
+    # Description: Performs 'NonPlayerCharacter.bump' both ways for each given
+    #              pair of NPCs, in order.
+    #
+    #      Inputs: first  - Array of indices of the first NPC in each pair.
+    #              second - Array of indices of the second NPC in each pair.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def bump_pairs(self, first, second):
+        a = self.arrays
+        (x, flying, facing, dx) = (a['x'], a['is_flying'], a['facing_right'],
+                                   a['dx'])
+        for (i, j) in zip(first.tolist(), second.tolist()):
+            if flying[i] or flying[j]:
+                continue
+            for (self_i, other_i) in ((i, j), (j, i)):
+                if ((facing[self_i] and x[other_i] > x[self_i]) or
+                    (not facing[self_i] and x[other_i] < x[self_i])):
+                    facing[self_i] = not facing[self_i]
+                    dx[self_i] *= -1.0
+
+    #---------------------------------------------------------------------------
+    #      Method: _get_bounds
+    #
+    # Description: Vectorized 'GameCharacter.get_bounds', for all NPCs.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: A tuple of (left, top, right, bottom) arrays.
+    #---------------------------------------------------------------------------
+    def _get_bounds(self):
+        a = self.arrays
+        (x, y, wo) = (a['x'], a['y'], a['width_offset'])
+        return (x + wo, y + a['height_offset'],
+                x + (CHARACTER_TILE_SIZE - 1) - wo,
+                y + (CHARACTER_TILE_SIZE - 1))
+
+    #---------------------------------------------------------------------------
+    #      Method: _flags_at
+    #
+    # Description: Vectorized 'Map.get_flags_at'.
+    #
+    #      Inputs: x - Array of horizontal coordinates, measured in pixels.
+    #              y - Array of vertical coordinates, measured in pixels.
+    #
+    #     Outputs: Array of flag bits.
+    #---------------------------------------------------------------------------
+    def _flags_at(self, x, y):
+        return self._flags(x // MAP_TILE_SIZE, y // MAP_TILE_SIZE)
+
+    #---------------------------------------------------------------------------
+    #      Method: _flags
+    #
+    # Description: Vectorized 'Map.get_flags'. (Streamed maps are queried one
+    #              cell at a time.)
+    #
+    #      Inputs: x - Array of horizontal coordinates, measured in tiles.
+    #              y - Array of vertical coordinates, measured in tiles.
+    #
+    #     Outputs: Array of flag bits.
+    #---------------------------------------------------------------------------
+    def _flags(self, x, y):
+        if self.flags is None:
+            get_flags = self.map.get_flags
+            (x, y) = np.broadcast_arrays(x, y)
+            return np.array([get_flags(i, j) for (i, j) in zip(x.tolist(),
+                                                                y.tolist())],
+                            dtype=np.uint8).reshape(x.shape)
+        x = np.clip(x, -1, self.map.map_width) + 1
+        y = np.clip(y, -1, self.map.map_height) + 1
+        return self.flags[y * self.map.flags_width + x]
+
+    #---------------------------------------------------------------------------
+    #      Method: _is_colliding
+    #
+    # Description: Vectorized 'GameCharacter.is_colliding'.
+    #
+    #      Inputs: x     - Array of hypothetical leftmost pixel columns.
+    #              y     - Array of hypothetical topmost pixel rows.
+    #              state - Dictionary of arrays for the NPCs in question.
+    #              dy    - Array of vertical velocities.
+    #
+    #     Outputs: Boolean array, 'True' where collision would occur.
+    #---------------------------------------------------------------------------
+    def _is_colliding(self, x, y, state, dy):
+        wo = state['width_offset']
+        left = x + wo
+        right = x + (CHARACTER_TILE_SIZE - 1) - wo
+        top = y + state['height_offset']
+        bottom = y + (CHARACTER_TILE_SIZE - 1)
+        mid_x = x + CHARACTER_TILE_SIZE // 2
+        mid_y = y + CHARACTER_TILE_SIZE // 2
+        flags_at = self._flags_at
+        feet = flags_at(left, bottom) | flags_at(right, bottom)
+        solid = (feet | flags_at(left, top) | flags_at(right, top) |
+                 flags_at(left, mid_y) | flags_at(right, mid_y) |
+                 flags_at(mid_x, top) | flags_at(mid_x, bottom))
+        return (((solid & TILE_SOLID) != 0) |
+                ((dy >= 0) & ((feet & TILE_TOP_SOLID) != 0)))
+
+    #---------------------------------------------------------------------------
+    #      Method: _sweep
+    #
+    # Description: Vectorized 'GameCharacter.sweep'.
+    #
+    #      Inputs: x          - Array of leftmost pixel columns.
+    #              y          - Array of topmost pixel rows.
+    #              state      - Dictionary of arrays for the NPCs in question.
+    #              dy         - Array of vertical velocities.
+    #              distance   - Array of maximum numbers of pixels to move.
+    #              sign       - Array of directions of movement (1 or -1).
+    #              horizontal - 'True' to move along the x-axis, 'False' for the
+    #                           y-axis.
+    #
+    #     Outputs: Array of numbers of pixels each NPC can move.
+    #---------------------------------------------------------------------------
+    def _sweep(self, x, y, state, dy, distance, sign, horizontal):
+        wo = state['width_offset']
+        left = x + wo
+        right = x + (CHARACTER_TILE_SIZE - 1) - wo
+        top = y + state['height_offset']
+        bottom = y + (CHARACTER_TILE_SIZE - 1)
+        mid_x = x + CHARACTER_TILE_SIZE // 2
+        mid_y = y + CHARACTER_TILE_SIZE // 2
+        foot_mask = np.where(dy >= 0, TILE_SOLID | TILE_TOP_SOLID, TILE_SOLID)
+        if horizontal:
+            edge_rows = [(top // MAP_TILE_SIZE, TILE_SOLID),
+                         (mid_y // MAP_TILE_SIZE, TILE_SOLID),
+                         (bottom // MAP_TILE_SIZE, foot_mask)]
+            probes = [(left, edge_rows), (right, edge_rows),
+                      (mid_x, [(top // MAP_TILE_SIZE, TILE_SOLID),
+                               (bottom // MAP_TILE_SIZE, TILE_SOLID)])]
+        else:
+            (left_col, right_col, mid_col) = (left // MAP_TILE_SIZE,
+                                              right // MAP_TILE_SIZE,
+                                              mid_x // MAP_TILE_SIZE)
+            probes = [(top, [(left_col, TILE_SOLID), (right_col, TILE_SOLID),
+                             (mid_col, TILE_SOLID)]),
+                      (mid_y, [(left_col, TILE_SOLID),
+                               (right_col, TILE_SOLID)]),
+                      (bottom, [(left_col, foot_mask), (right_col, foot_mask),
+                                (mid_col, TILE_SOLID)])]
+        blocked_step = distance + 1
+        max_tiles = (int(distance.max()) + MAP_TILE_SIZE - 1) // MAP_TILE_SIZE
+        for (start, cells) in probes:
+            first_tile = (start + sign) // MAP_TILE_SIZE
+            last_tile = (start + sign * distance) // MAP_TILE_SIZE
+            for k in range(max_tiles + 1):
+                tile = first_tile + sign * k
+                in_range = (distance > 0) & (sign * (last_tile - tile) >= 0)
+                step = np.maximum(np.where(sign > 0,
+                                           tile * MAP_TILE_SIZE - start,
+                                           start - tile * MAP_TILE_SIZE -
+                                           (MAP_TILE_SIZE - 1)), 1)
+                blocked = np.zeros(len(x), dtype=np.bool_)
+                for (fixed, mask) in cells:
+                    if horizontal:
+                        flags = self._flags(tile, fixed)
+                    else:
+                        flags = self._flags(fixed, tile)
+                    blocked |= (flags & mask) != 0
+                blocked &= in_range & (step < blocked_step)
+                blocked_step = np.where(blocked, step, blocked_step)
+        return blocked_step - 1
+
+#-------------------------------------------------------------------------------
+#       Class: NPCView
+#
+# Description: Presents one NPC in an 'NPCStore' with the same attributes and
+#              methods as a 'NonPlayerCharacter' (apart from 'game_logic').
+#
+#     Methods: __init__, get_bounds, overlaps, get_interpolated_position,
+#              turn_around, bump, get_sprite, draw
+#-------------------------------------------------------------------------------
+class NPCView:
+    is_crouching = False
+    is_climbing = False
+
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates a view of an NPC.
+    #
+    #      Inputs: store - The 'NPCStore' holding the NPC.
+    #              index - The NPC's index in the store's arrays.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+        self.tiles = store.tiles
+        self.map = store.map
+        self.screen = store.screen
+        self.sprite_tables = characters.get_sprite_tables(store.tiles)
+
+    get_bounds = characters.GameCharacter.get_bounds
+    overlaps = characters.GameCharacter.overlaps
+    get_interpolated_position = \
+        characters.GameCharacter.get_interpolated_position
+    turn_around = characters.NonPlayerCharacter.turn_around
+    bump = characters.NonPlayerCharacter.bump
+    get_sprite = characters.NonPlayerCharacter.get_sprite
+    draw = characters.NonPlayerCharacter.draw
+
+#-------------------------------------------------------------------------------
+#    Function: _field_property
+#
+# Description: Creates a property reading and writing one element of one of an
+#              'NPCStore' object's arrays.
+#
+#      Inputs: name      - Name of the field.
+#              to_python - Type to convert elements to when read.
+#
+#     Outputs: The property.
+#-------------------------------------------------------------------------------
+def _field_property(name, to_python):
+    def get_field(view):
+        return to_python(view.store.arrays[name][view.index])
+    def set_field(view, value):
+        view.store.arrays[name][view.index] = value
+    return property(get_field, set_field)
+
+for (name, _, to_python) in NPC_FIELDS:
+    setattr(NPCView, name, _field_property(name, to_python))
+
+#-------------------------------------------------------------------------------
+#    Function: push_x
+#
+# Description: Vectorized 'GameCharacter.push_x'.
+#
+#      Inputs: dx          - Array of horizontal velocities.
+#              facing      - Array of orientations ('True' if facing right).
+#              ddx         - Array of changes to horizontal velocities.
+#              max_speed_x - Array of maximum horizontal speeds.
+#              mask        - Optional boolean array selecting which NPCs to
+#                            accelerate (all of them by default).
+#
+#     Outputs: A tuple containing the new velocity and orientation arrays.
+#-------------------------------------------------------------------------------
+def push_x(dx, facing, ddx, max_speed_x, mask=True):
+    pushed = dx + ddx
+    facing = np.where(mask & (pushed > 0.0), True,
+                      np.where(mask & (pushed < 0.0), False, facing))
+    pushed = np.minimum(np.maximum(pushed, max_speed_x * -1.0), max_speed_x)
+    return (np.where(mask, pushed, dx), facing)
+
+#-------------------------------------------------------------------------------
+#    Function: push_y
+#
+# Description: Vectorized 'GameCharacter.push_y'.
+#
+#      Inputs: dy          - Array of vertical velocities.
+#              ddy         - Change(s) to vertical velocities.
+#              max_speed_y - Array of maximum vertical speeds.
+#
+#     Outputs: Array of new vertical velocities.
+#-------------------------------------------------------------------------------
+def push_y(dy, ddy, max_speed_y):
+    return np.minimum(np.maximum(dy + ddy, max_speed_y * -1.0), max_speed_y)
+
+#-------------------------------------------------------------------------------
+#    Function: round_up
+#
+# Description: Vectorized 'GameCharacter.round_up'.
+#
+#      Inputs: n - Array of floating point values to be rounded up.
+#
+#     Outputs: Array of rounded-up integer values.
+#-------------------------------------------------------------------------------
+def round_up(n):
+    return (((np.ceil(n).astype(np.int64) + (MIN_PIXELS_PER_FRAME - 1)) //
+             MIN_PIXELS_PER_FRAME) * MIN_PIXELS_PER_FRAME)
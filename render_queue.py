@@ -0,0 +1,88 @@
+#-------------------------------------------------------------------------------
+#    Filename: render_queue.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Contains a 'RenderQueue' class that collects a frame's blits so
+#              they can be drawn with a single call to 'Surface.blits'.
+#-------------------------------------------------------------------------------
+
+# layers, drawn from lowest to highest
+RENDER_LAYER_MAP = 0
+RENDER_LAYER_CHARACTERS = 1
+
+#-------------------------------------------------------------------------------
+#       Class: RenderQueue
+#
+# Description: A list of pending blits, grouped by layer. Blits in a lower
+#              layer are drawn first; within a layer they are drawn in the
+#              order they were added.
+#
+#     Methods: __init__, add, extend, flush
+#-------------------------------------------------------------------------------
+class RenderQueue:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates an empty render queue.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self):
+        self.layers = {} # layer -> list of blit arguments
+
+    #---------------------------------------------------------------------------
+    #      Method: add
+    #
+    # Description: Queues one blit.
+    #
+    #      Inputs: surface  - The surface to draw.
+    #              position - Tuple containing (x, y) pixel coordinates of its
+    #                         upper-left corner.
+    #              area     - Optional 'Rect' of the part of 'surface' to draw.
+    #              layer    - Layer to draw it in.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def add(self, surface, position, area=None, layer=RENDER_LAYER_MAP):
+        entries = self.layers.get(layer)
+        if entries is None:
+            entries = self.layers[layer] = []
+        if area is None:
+            entries.append((surface, position))
+        else:
+            entries.append((surface, position, area))
+
+    #---------------------------------------------------------------------------
+    #      Method: extend
+    #
+    # Description: Queues several blits in one layer.
+    #
+    #      Inputs: entries - Iterable of (surface, position) or (surface,
+    #                        position, area) tuples.
+    #              layer   - Layer to draw them in.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def extend(self, entries, layer=RENDER_LAYER_MAP):
+        if layer in self.layers:
+            self.layers[layer].extend(entries)
+        else:
+            self.layers[layer] = list(entries)
+
+    #---------------------------------------------------------------------------
+    #      Method: flush
+    #
+    # Description: Draws every pending blit onto a surface, layer by layer,
+    #              and empties the queue.
+    #
+    #      Inputs: surface - The surface on which to draw.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def flush(self, surface):
+        for layer in sorted(self.layers):
+            surface.blits(self.layers[layer], doreturn=False)
+        self.layers.clear()
@@ -0,0 +1,183 @@
+#-------------------------------------------------------------------------------
+#    Filename: rewind.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Contains a 'RewindBuffer' class that remembers recent game
+#              states so play can be scrubbed backwards.
+#-------------------------------------------------------------------------------
+
+import sys
+from collections import deque
+import pygame
+import game_state
+
+REWIND_KEY = pygame.K_BACKSPACE # held to scrub backwards
+
+# approximate memory used by parts of a recorded state, in bytes
+DELTA_OVERHEAD = 160 # a delta besides its records
+RECORD_OVERHEAD = sys.getsizeof(b'') + 48 # a changed record besides its data
+RNG_STATE_SIZE = 25000 # a random number generator's state (625 integers)
+
+#-------------------------------------------------------------------------------
+#       Class: RewindBuffer
+#
+# Description: A memory-bounded history of game states. Every tick's state is
+#              stored as a delta against the previous tick, holding only the
+#              characters whose packed state changed, with a full keyframe
+#              every 'keyframe_interval' ticks (and whenever the level or the
+#              number of NPCs changes). The oldest keyframe and its deltas are
+#              discarded once the budget is exceeded.
+#
+#     Methods: __init__, __len__, record, step_back, clear, _get_state
+#-------------------------------------------------------------------------------
+class RewindBuffer:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates an empty rewind buffer.
+    #
+    #      Inputs: budget            - Maximum memory to use, in bytes.
+    #              keyframe_interval - Ticks between keyframes.
+    #              record_size       - Size of each NPC's packed state.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, budget, keyframe_interval, record_size):
+        self.budget = budget
+        self.keyframe_interval = keyframe_interval
+        self.record_size = record_size
+        self.segments = deque() # [keyframe, deltas, size] lists, oldest first
+        self.size = 0 # approximate bytes used by all segments
+        self.latest = None # most recently recorded state
+
+    #---------------------------------------------------------------------------
+    #      Method: __len__
+    #
+    # Description: Returns the number of states that may be rewound through.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: Number of recorded states.
+    #---------------------------------------------------------------------------
+    def __len__(self):
+        return sum(len(segment[1]) + 1 for segment in self.segments)
+
+    #---------------------------------------------------------------------------
+    #      Method: record
+    #
+    # Description: Adds the state at the end of a tick.
+    #
+    #      Inputs: state - A 'GameState' taken by 'ToadsAdventure.save_state'.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def record(self, state):
+        previous = self.latest
+        self.latest = state
+        if (previous is None or
+            len(self.segments[-1][1]) + 1 >= self.keyframe_interval or
+            state.map is not previous.map or
+            len(state.NPCs) != len(previous.NPCs)):
+            size = (DELTA_OVERHEAD + len(state.player) + len(state.NPCs) +
+                    RNG_STATE_SIZE)
+            self.segments.append([state, [], size])
+            self.size += size
+            while self.size > self.budget and len(self.segments) > 1:
+                self.size -= self.segments.popleft()[2]
+            return
+
+        # store only what differs from the previous tick
+        record_size = self.record_size
+        (NPCs, previous_NPCs) = (state.NPCs, previous.NPCs)
+        changes = []
+        for offset in range(0, len(NPCs), record_size):
+            end = offset + record_size
+            if NPCs[offset:end] != previous_NPCs[offset:end]:
+                changes.append((offset, NPCs[offset:end]))
+        player = None
+        if state.player != previous.player:
+            player = state.player
+        rng_state = None
+        if state.rng_state != previous.rng_state:
+            rng_state = state.rng_state
+        size = (DELTA_OVERHEAD +
+                (RECORD_OVERHEAD + record_size) * len(changes))
+        if player is not None:
+            size += RECORD_OVERHEAD + len(player)
+        if rng_state is not None:
+            size += RNG_STATE_SIZE
+        delta = (state.level_complete, state.ticks, rng_state, player,
+                 tuple(changes), size)
+        segment = self.segments[-1]
+        segment[1].append(delta)
+        segment[2] += size
+        self.size += size
+        while self.size > self.budget and len(self.segments) > 1:
+            self.size -= self.segments.popleft()[2]
+
+    #---------------------------------------------------------------------------
+    #      Method: step_back
+    #
+    # Description: Discards the latest state and returns the one before it.
+    #              The oldest state is never discarded.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: The 'GameState' to restore, or 'None' if nothing has been
+    #              recorded.
+    #---------------------------------------------------------------------------
+    def step_back(self):
+        if not self.segments:
+            return None
+        segment = self.segments[-1]
+        if segment[1]:
+            size = segment[1].pop()[-1]
+            segment[2] -= size
+            self.size -= size
+        elif len(self.segments) > 1:
+            self.size -= self.segments.pop()[2]
+        self.latest = self._get_state(self.segments[-1])
+        return self.latest
+
+    #---------------------------------------------------------------------------
+    #      Method: clear
+    #
+    # Description: Forgets every recorded state.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def clear(self):
+        self.segments.clear()
+        self.size = 0
+        self.latest = None
+
+    #---------------------------------------------------------------------------
+    #      Method: _get_state
+    #
+    # Description: Rebuilds the latest state of a segment by applying its
+    #              deltas, in order, to its keyframe.
+    #
+    #      Inputs: segment - A [keyframe, deltas, size] list.
+    #
+    #     Outputs: A 'GameState'.
+    #---------------------------------------------------------------------------
+    def _get_state(self, segment):
+        (keyframe, deltas, _) = segment
+        if not deltas:
+            return keyframe
+        (rng_state, player) = (keyframe.rng_state, keyframe.player)
+        NPCs = bytearray(keyframe.NPCs)
+        for (level_complete, ticks, delta_rng_state, delta_player, changes,
+             _) in deltas:
+            if delta_rng_state is not None:
+                rng_state = delta_rng_state
+            if delta_player is not None:
+                player = delta_player
+            for (offset, record) in changes:
+                NPCs[offset:offset + len(record)] = record
+        return game_state.GameState(keyframe.level, level_complete,
+                                    keyframe.map, ticks, rng_state, player,
+                                    bytes(NPCs))
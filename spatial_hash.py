@@ -0,0 +1,90 @@
+#-------------------------------------------------------------------------------
+#    Filename: spatial_hash.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Provides a uniform-grid spatial hash for finding game characters
+#              that may overlap, without testing every pair.
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+#       Class: SpatialHash
+#
+# Description: Buckets game characters by the grid cells their bounding boxes
+#              touch. Characters sharing a cell are candidates for overlap.
+#
+#     Methods: __init__, clear, insert, get_pairs
+#-------------------------------------------------------------------------------
+class SpatialHash:
+    #---------------------------------------------------------------------------
+    #      Method: __init__
+    #
+    # Description: Creates an empty spatial hash.
+    #
+    #      Inputs: cell_size - Length of a side of a grid cell, in pixels.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.order = {} # insertion order of each character, by ID
+
+    #---------------------------------------------------------------------------
+    #      Method: clear
+    #
+    # Description: Removes all characters from the spatial hash.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def clear(self):
+        self.cells.clear()
+        self.order.clear()
+
+    #---------------------------------------------------------------------------
+    #      Method: insert
+    #
+    # Description: Adds a character to every cell its bounding box touches.
+    #              Should be called after the character has moved.
+    #
+    #      Inputs: character - The game character to add.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def insert(self, character):
+        (left, top, right, bottom) = character.get_bounds()
+        self.order[id(character)] = len(self.order)
+        cell_size = self.cell_size
+        for cell_y in range(top // cell_size, bottom // cell_size + 1):
+            for cell_x in range(left // cell_size, right // cell_size + 1):
+                cell = self.cells.get((cell_x, cell_y))
+                if cell is None:
+                    self.cells[(cell_x, cell_y)] = [character]
+                else:
+                    cell.append(character)
+
+    #---------------------------------------------------------------------------
+    #      Method: get_pairs
+    #
+    # Description: Finds every pair of characters sharing at least one cell.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: List of (first, second) tuples, each pair listed once, with
+    #              the earlier-inserted character first.
+    #---------------------------------------------------------------------------
+    def get_pairs(self):
+        order = self.order
+        pairs = {}
+        for cell in self.cells.values():
+            for i in range(len(cell) - 1):
+                for j in range(i + 1, len(cell)):
+                    (a, b) = (cell[i], cell[j])
+                    if order[id(a)] > order[id(b)]:
+                        (a, b) = (b, a)
+                    pairs[(id(a), id(b))] = (a, b)
+        return sorted(pairs.values(),
+                      key=lambda pair: (order[id(pair[0])],
+                                        order[id(pair[1])]))
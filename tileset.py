@@ -7,7 +7,8 @@
 #              2.7 and Pygame 1.9.
 #-------------------------------------------------------------------------------
 
-from pygame import image, rect
+import pygame
+from pygame import display, image, mask, rect
 from config import *
 
 #-------------------------------------------------------------------------------
@@ -15,13 +16,17 @@ from config import *
 #
 # Description: Responsible for preparing and providing tile images.
 #
-#     Methods: __init__, get_image, get_tile_coords_at, _is_valid_tile_num
+#     Methods: __init__, get_image, get_sprite, get_tile_coords_at,
+#              _prepare_tile, _is_valid_tile_num
 #-------------------------------------------------------------------------------
 class Tileset:
     #---------------------------------------------------------------------------
     #      Method: __init__
     #
-    # Description: Loads an image file and extracts tile surfaces from it.
+    # Description: Loads an image file and extracts tile surfaces from it,
+    #              converted to the display's pixel format if a display exists.
+    #              Each tile is also cropped to its non-transparent area (see
+    #              '_prepare_tile').
     #
     #      Inputs: filename  - Name of an image file.
     #              tile_size - Length of a side of a single tile.
@@ -30,17 +35,21 @@ class Tileset:
     #---------------------------------------------------------------------------
     def __init__(self, filename, tile_size):
         tileset_image = image.load(filename)
+        if display.get_surface() is not None:
+            tileset_image = tileset_image.convert_alpha()
         (self.image_width, self.image_height) = tileset_image.get_size()
         self.tile_size = tile_size
         self.cols = self.image_width  // self.tile_size
         self.rows = self.image_height // self.tile_size
         self.tiles = []
+        self.cropped_tiles = [] # non-transparent area only ('None' if empty)
+        self.crop_offsets = []  # (x, y) of cropped area within each tile
         y = 0
         for r in range(self.rows):
             x = 0
             for c in range(self.cols):
                 tile_rect = rect.Rect(x, y, self.tile_size, self.tile_size)
-                self.tiles.append(tileset_image.subsurface(tile_rect))
+                self._prepare_tile(tileset_image.subsurface(tile_rect))
                 x += self.tile_size
             y += self.tile_size
 
@@ -60,6 +69,27 @@ class Tileset:
             return self.tiles[tile_num]
         return None
 
+    #---------------------------------------------------------------------------
+    #      Method: get_sprite
+    #
+    # Description: Determines what to blit for a tile: its cropped,
+    #              non-transparent area and where that goes.
+    #
+    #      Inputs: tile_num - Tile number of interest.
+    #              position - Tuple containing (x, y) pixel coordinates of the
+    #                         tile's upper-left corner.
+    #
+    #     Outputs: A tuple containing the surface to blit and its position (or
+    #              'None' for a fully transparent or invalid tile).
+    #---------------------------------------------------------------------------
+    def get_sprite(self, tile_num, position):
+        if self._is_valid_tile_num(tile_num):
+            cropped_tile = self.cropped_tiles[tile_num]
+            if cropped_tile is not None:
+                (x, y) = self.crop_offsets[tile_num]
+                return (cropped_tile, (position[0] + x, position[1] + y))
+        return None
+
     #---------------------------------------------------------------------------
     #      Method: get_tile_coords_at
     #
@@ -74,6 +104,34 @@ class Tileset:
     def get_tile_coords_at(self, x, y):
         return (x // self.tile_size, y // self.tile_size)
 
+    #---------------------------------------------------------------------------
+    #      Method: _prepare_tile
+    #
+    # Description: Stores a tile along with a blit-ready copy of its
+    #              non-transparent area ('None' if it has none): without
+    #              per-pixel alpha if it is fully opaque, otherwise
+    #              RLE-accelerated if TILESET_RLE_ACCELERATION is set.
+    #
+    #      Inputs: tile - Surface containing the tile image.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _prepare_tile(self, tile):
+        self.tiles.append(tile)
+        bounds = tile.get_bounding_rect()
+        self.crop_offsets.append((bounds.x, bounds.y))
+        if bounds.width == 0 or bounds.height == 0: # fully transparent
+            self.cropped_tiles.append(None)
+            return
+        opaque = (mask.from_surface(tile, 254).count() ==
+                  self.tile_size * self.tile_size)
+        cropped_tile = tile.subsurface(bounds).copy()
+        if opaque and display.get_surface() is not None:
+            cropped_tile = cropped_tile.convert()
+        elif not opaque and TILESET_RLE_ACCELERATION:
+            cropped_tile.set_alpha(255, pygame.RLEACCEL)
+        self.cropped_tiles.append(cropped_tile)
+
     #---------------------------------------------------------------------------
     #      Method: _is_valid_tile_num
     #
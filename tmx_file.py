@@ -0,0 +1,212 @@
+#-------------------------------------------------------------------------------
+#    Filename: tmx_file.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Loads levels straight from the TMX files written by Tiled
+#              (https://www.mapeditor.org). Decoded levels are cached in the
+#              binary level format (see 'level_file.py'), keyed by a hash of
+#              the TMX file's contents, so later loads skip XML parsing.
+#-------------------------------------------------------------------------------
+
+import array
+import base64
+import hashlib
+import os
+import sys
+import threading
+import zlib
+import xml.etree.ElementTree as ElementTree
+import level_file
+try:
+    import numpy as np
+except ImportError: # NumPy only speeds up decoding
+    np = None
+
+TMX_DECODER_VERSION = 1 # bump to invalidate cached levels
+TMX_TILE_MASK = 0x1FFFFFFF # global tile ID bits, without Tiled's flip flags
+
+#-------------------------------------------------------------------------------
+#    Function: load_level
+#
+# Description: Loads a level from a TMX file, using (or creating) a cached
+#              binary copy in a given directory. If the cache can't be
+#              written, the decoded level is returned directly. Any number of
+#              threads and processes may load levels at once.
+#
+#      Inputs: filename  - Name of a TMX file.
+#              cache_dir - Directory holding cached levels ('None' to skip the
+#                          cache).
+#
+#     Outputs: A tuple containing the level's width, height, and a flat,
+#              row-major sequence of its tile numbers (-1 for empty tiles).
+#-------------------------------------------------------------------------------
+def load_level(filename, cache_dir=None):
+    with open(filename, 'rb') as fileIn:
+        contents = fileIn.read()
+    if cache_dir is None:
+        return parse_tmx(contents, filename)
+    cache_filename = get_cache_filename(filename, contents, cache_dir)
+    if os.path.exists(cache_filename):
+        try:
+            return level_file.load_level(cache_filename)
+        except ValueError: # damaged cache file, so decode again
+            pass
+    (width, height, tiles) = parse_tmx(contents, filename)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_filename = '%s.%d.%d.tmp' % (cache_filename, os.getpid(),
+                                          threading.get_ident())
+        level_file.save_level(temp_filename, width, height, tiles)
+        os.replace(temp_filename, cache_filename)
+        remove_stale_caches(filename, cache_filename, cache_dir)
+    except OSError: # e.g., a read-only installation
+        return (width, height, memoryview(tiles))
+    return level_file.load_level(cache_filename)
+
+#-------------------------------------------------------------------------------
+#    Function: get_cache_filename
+#
+# Description: Names the cached copy of a TMX file's current contents.
+#
+#      Inputs: filename  - Name of the TMX file.
+#              contents  - The TMX file's contents.
+#              cache_dir - Directory holding cached levels.
+#
+#     Outputs: Name of the cache file.
+#-------------------------------------------------------------------------------
+def get_cache_filename(filename, contents, cache_dir):
+    digest = hashlib.sha1(contents)
+    digest.update(b'%d' % TMX_DECODER_VERSION)
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(cache_dir, '%s-%s.lvl' % (stem, digest.hexdigest()))
+
+#-------------------------------------------------------------------------------
+#    Function: remove_stale_caches
+#
+# Description: Deletes cached copies of older versions of a TMX file.
+#
+#      Inputs: filename       - Name of the TMX file.
+#              cache_filename - Name of the current cache file, to keep.
+#              cache_dir      - Directory holding cached levels.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def remove_stale_caches(filename, cache_filename, cache_dir):
+    prefix = os.path.splitext(os.path.basename(filename))[0] + '-'
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if (name.startswith(prefix) and name.endswith('.lvl') and
+            len(name) == len(prefix) + 44 and # 40 hex digits + '.lvl'
+            path != cache_filename):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+#-------------------------------------------------------------------------------
+#    Function: parse_tmx
+#
+# Description: Decodes the tile layer of a TMX map. The map must be
+#              orthogonal and have exactly one layer, in any encoding Tiled
+#              writes except zstd compression.
+#
+#      Inputs: contents - The TMX file's contents.
+#              filename - Name of the file, for error messages.
+#
+#     Outputs: A tuple containing the level's width, height, and an array of
+#              its tile numbers (-1 for empty tiles).
+#-------------------------------------------------------------------------------
+def parse_tmx(contents, filename):
+    try:
+        map_element = ElementTree.fromstring(contents)
+    except ElementTree.ParseError as error:
+        raise ValueError('%s is not valid XML: %s' % (filename, error))
+    if map_element.get('orientation') != 'orthogonal':
+        raise ValueError('%s: orientation must be orthogonal, not %s' %
+                         (filename, map_element.get('orientation')))
+    width = int(map_element.get('width'))
+    height = int(map_element.get('height'))
+    if width < 1 or height < 1:
+        raise ValueError('%s: map is too small: %d x %d' % (filename, width,
+                                                             height))
+    first_gid = int(map_element.find('tileset').get('firstgid'))
+    layers = map_element.findall('layer')
+    if len(layers) != 1:
+        raise ValueError('%s: map must contain exactly one layer, not %d' %
+                         (filename, len(layers)))
+    layer = layers[0]
+    if (int(layer.get('width')) != width or
+        int(layer.get('height')) != height):
+        raise ValueError('%s: layer size does not match map size' % filename)
+    gids = decode_layer_data(layer.find('data'), filename)
+    if len(gids) != width * height:
+        raise ValueError('%s: found %d tiles but expected %d' %
+                         (filename, len(gids), width * height))
+    return (width, height, get_tile_numbers(gids, first_gid))
+
+#-------------------------------------------------------------------------------
+#    Function: get_tile_numbers
+#
+# Description: Converts global tile IDs to tile numbers within the map's
+#              tileset, ignoring flipping.
+#
+#      Inputs: gids      - Array of unsigned 32-bit global tile IDs.
+#              first_gid - Global ID of the tileset's first tile.
+#
+#     Outputs: An array of tile numbers (-1 for empty tiles).
+#-------------------------------------------------------------------------------
+def get_tile_numbers(gids, first_gid):
+    tiles = array.array(level_file.LEVEL_FILE_TILE_FORMAT)
+    if np is None:
+        tiles.extend([(gid & TMX_TILE_MASK) - first_gid if gid else -1
+                      for gid in gids])
+        return tiles
+    ids = np.frombuffer(gids, dtype=np.uint32) & TMX_TILE_MASK
+    numbers = np.where(ids == 0, -1, ids.astype(np.int64) - first_gid)
+    if len(numbers) and (numbers.min() < -1 or numbers.max() > 0x7FFF):
+        raise OverflowError('tile number out of range')
+    tiles.frombytes(numbers.astype(np.int16).tobytes())
+    return tiles
+
+#-------------------------------------------------------------------------------
+#    Function: decode_layer_data
+#
+# Description: Decodes the global tile IDs of a TMX layer's '<data>' element,
+#              which may hold base64 (uncompressed, zlib, or gzip), CSV, or
+#              (in old files) one '<tile>' element per cell.
+#
+#      Inputs: data     - The '<data>' element.
+#              filename - Name of the file, for error messages.
+#
+#     Outputs: An array of unsigned 32-bit global tile IDs.
+#-------------------------------------------------------------------------------
+def decode_layer_data(data, filename):
+    encoding = data.get('encoding')
+    compression = data.get('compression')
+    gids = array.array('I') # 32 bits on all supported platforms
+    if encoding is None:
+        gids.extend([int(tile.get('gid', 0)) for tile in data.iter('tile')])
+        return gids
+    if encoding == 'csv':
+        text = (data.text or '').strip()
+        if text:
+            gids.extend([int(gid) for gid in text.split(',')])
+        return gids
+    if encoding != 'base64':
+        raise ValueError('%s: unsupported layer encoding %s' % (filename,
+                                                                encoding))
+    raw = base64.b64decode((data.text or '').strip())
+    if compression == 'zlib':
+        raw = zlib.decompress(raw)
+    elif compression == 'gzip':
+        raw = zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+    elif compression:
+        raise ValueError('%s: unsupported compression %s (save with zlib, '
+                         'gzip, or none)' % (filename, compression))
+    if len(raw) % 4:
+        raise ValueError('%s: layer data is the wrong size' % filename)
+    gids.frombytes(raw)
+    if sys.byteorder != 'little':
+        gids.byteswap()
+    return gids
@@ -8,20 +8,42 @@
 # Description: Contains a 'ToadsAdventure' class for managing a platformer game.
 #-------------------------------------------------------------------------------
 
-import sys
+import argparse
+import io
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pygame
 from pygame import mouse, mixer
 import game
 import tileset
 import map
 import characters
+import spatial_hash
+import input_file
+import game_clock
+import game_state
+import rewind
+import render_queue
 from config import *
+try:
+    import npc_store
+except ImportError: # NumPy is only needed for the optional NPC store
+    npc_store = None
+
+# prepares upcoming levels (threads start on first use)
+level_executor = ThreadPoolExecutor(max_workers=1,
+                                    thread_name_prefix='level-preloading')
 
 #-------------------------------------------------------------------------------
 #       Class: ToadsAdventure
 #
 # Description: Manages the Toad's Adventure platformer game.
 #
-#     Methods: __init__, load_level, game_logic, paint
+#     Methods: __init__, load_level, prepare_level, preload_level,
+#              create_NPCs, game_logic,
+#              update_activation, resolve_overlaps, save_state, restore_state,
+#              paint, get_sprites, paint_changes, repaint
 #-------------------------------------------------------------------------------
 class ToadsAdventure(game.Game):
     #---------------------------------------------------------------------------
@@ -32,58 +54,210 @@ class ToadsAdventure(game.Game):
     #      Inputs: level                    - Number indicating desired level.
     #              map_tiles_filename       - Name of map tileset file.
     #              character_tiles_filename - Name of character tileset file.
-    #              fps                      - Desired frames per second
+    #              fps                      - Simulation ticks per second.
+    #              render_fps               - Maximum rendered frames per
+    #                                         second (0 for no limit).
+    #              headless                 - 'True' to run without a display,
+    #                                         music, or mouse handling.
+    #              offscreen                - 'True' to render into an
+    #                                         offscreen surface when headless.
+    #              use_npc_store            - 'True' to keep NPCs in a
+    #                                         vectorized 'NPCStore' (requires
+    #                                         NumPy) rather than a list.
+    #              timings                  - 'True' to record per-phase
+    #                                         frame timings.
+    #              overlay                  - 'True' to show those timings on
+    #                                         screen.
+    #              timings_filename         - Optional file to which timings
+    #                                         are saved on exit.
+    #              seed                     - Seed for the game's random
+    #                                         number generator (chosen at
+    #                                         random if 'None').
+    #              record_filename          - Optional file to which every
+    #                                         tick's input is saved on exit.
+    #              use_rewind               - 'True' to remember recent
+    #                                         states, so holding REWIND_KEY
+    #                                         scrubs backwards.
+    #              dirty_rects              - 'True' to update only the
+    #                                         changed parts of the display.
+    #              preload                  - 'True' to prepare each next
+    #                                         level in the background.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def __init__(self, level, map_tiles_filename, character_tiles_filename,
-                 fps=FRAMES_PER_SECOND):
-        game.Game.__init__(self, fps)
+                 fps=FRAMES_PER_SECOND, render_fps=RENDER_FRAMES_PER_SECOND,
+                 headless=False, offscreen=False, use_npc_store=USE_NPC_STORE,
+                 timings=False, overlay=False, timings_filename=None,
+                 seed=None, record_filename=None, use_rewind=USE_REWIND,
+                 dirty_rects=USE_DIRTY_RECTS, preload=USE_LEVEL_PRELOADING):
+        if use_npc_store and npc_store is None:
+            raise ImportError('the NPC store requires NumPy')
+        game.Game.__init__(self, fps, render_fps, headless, offscreen,
+                           timings=timings, overlay=overlay,
+                           timings_filename=timings_filename,
+                           dirty_rects=dirty_rects)
+        self.use_npc_store = use_npc_store
         self.map_tiles = tileset.Tileset(map_tiles_filename, MAP_TILE_SIZE)
         self.character_tiles = tileset.Tileset(character_tiles_filename,
                                                CHARACTER_TILE_SIZE)
         if level < 1 or level > NUM_LEVELS:
             level = 1
         self.current_level = level
-        mixer.init()
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.clock = game_clock.GameClock(fps)
+        self.rewind_buffer = None
+        if use_rewind:
+            self.rewind_buffer = rewind.RewindBuffer(
+                REWIND_BUDGET_MB * 1024 * 1024, REWIND_KEYFRAME_INTERVAL,
+                characters.NonPlayerCharacter.STATE.size)
+        if record_filename:
+            self.recorder = input_file.InputRecorder(record_filename, level,
+                                                     fps, seed)
+        self.preload = preload
+        self.preloading = None # (level, future) of the level being prepared
+        self.music_file = None # in-memory music being played
+        self.map = None
+        self.sprites = [] # (surface, position) tuples drawn by 'paint'
+        self.render_queue = render_queue.RenderQueue()
+        self.spatial_hash = spatial_hash.SpatialHash(SPATIAL_HASH_CELL_TILES *
+                                                     MAP_TILE_SIZE)
+        if not self.headless:
+            mixer.init()
         self.load_level(self.current_level)
-        mouse.set_visible(False)
+        if not self.headless:
+            mouse.set_visible(False)
 
     #---------------------------------------------------------------------------
     #      Method: load_level
     #
-    # Description: Initializes map, characters, and music for a given level.
+    # Description: Initializes map, characters, and music for a given level,
+    #              using the level prepared by 'preload_level' if it's the one
+    #              desired (waiting for it to be finished if need be) or else
+    #              preparing it now. Everything is swapped in at once, then
+    #              the next level starts being prepared if preloading is on.
     #
     #      Inputs: level - Number corresponding to the desired level.
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def load_level(self, level):
-        self.map = map.Map(level, self.map_tiles, self.screen, self.width,
-                           self.height)
+        self.level_complete = False
+        prepared = None
+        if self.preloading is not None and self.preloading[0] == level:
+            prepared = self.preloading[1].result()
+            self.preloading = None
+        if prepared is None:
+            prepared = self.prepare_level(level)
+        (new_map, self.NPCs, music) = prepared
+        if self.map is not None:
+            new_map.reuse_view(self.map)
+        self.map = new_map
 ##        self.items = []
 ##        for item in ITEM_LOCATIONS[level]:
 ##            self.items.append(Item(item[0], # ID number self.character_tiles,
 ##                                   self.map, self.screen,
 ##                                   (item[1] - 1) * MAP_TILE_SIZE,
 ##                                   (item[2] - 1) * MAP_TILE_SIZE))
-        self.NPCs = []
-        for NPC in NPC_LOCATIONS[level]:
-            self.NPCs.append(characters.NonPlayerCharacter(
-                NPC[0], self.character_tiles, self.map, self.screen,
-                (NPC[1] - 1) * MAP_TILE_SIZE, (NPC[2] - 1) * MAP_TILE_SIZE))
         self.player = characters.PlayerCharacter(
             self.character_tiles, self.map, self.screen,
             (PLAYER_START_LOCATION[level][0] - 1) * MAP_TILE_SIZE,
-            (PLAYER_START_LOCATION[level][1] - 1) * MAP_TILE_SIZE)
-        mixer.music.load(MUSIC[level])
-        mixer.music.play(-1) # -1 for infinite looping
+            (PLAYER_START_LOCATION[level][1] - 1) * MAP_TILE_SIZE,
+            rng=self.rng, clock=self.clock)
+        if music is not None:
+            self.music_file = io.BytesIO(music) # must outlive playback
+            mixer.music.load(self.music_file,
+                             os.path.splitext(MUSIC[level])[1][1:])
+            mixer.music.play(-1) # -1 for infinite looping
+        if self.preload:
+            self.preload_level(level % NUM_LEVELS + 1)
+
+    #---------------------------------------------------------------------------
+    #      Method: prepare_level
+    #
+    # Description: Does the slow part of loading a level: reads its map and
+    #              builds its collision flags, pre-renders the chunks visible
+    #              from the player's starting location, creates its NPCs, and
+    #              reads its music file. Nothing the game is using is changed,
+    #              so this may run on a background thread.
+    #
+    #      Inputs: level - Number corresponding to the desired level.
+    #
+    #     Outputs: A tuple containing the map, the NPCs (as 'create_NPCs'
+    #              returns them), and the music file's contents ('None' when
+    #              headless).
+    #---------------------------------------------------------------------------
+    def prepare_level(self, level):
+        new_map = map.Map(level, self.map_tiles, self.screen, self.width,
+                          self.height)
+        if self.screen is not None:
+            (x, y) = new_map.player_start_location # as in 'paint'
+            new_map.prepare_view(x - (self.width // 2),
+                                 y - (self.height // 2))
+        NPCs = self.create_NPCs(NPC_LOCATIONS[level], new_map)
+        music = None
+        if not self.headless:
+            with open(MUSIC[level], 'rb') as fileIn:
+                music = fileIn.read()
+        return (new_map, NPCs, music)
+
+    #---------------------------------------------------------------------------
+    #      Method: preload_level
+    #
+    # Description: Starts preparing a level on a background thread, to be
+    #              picked up by 'load_level'. A level already being prepared
+    #              for is kept; any other is abandoned.
+    #
+    #      Inputs: level - Number corresponding to the desired level.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def preload_level(self, level):
+        if self.preloading is not None:
+            if self.preloading[0] == level:
+                return
+            self.preloading[1].cancel()
+        self.preloading = (level, level_executor.submit(self.prepare_level,
+                                                        level))
+
+    #---------------------------------------------------------------------------
+    #      Method: create_NPCs
+    #
+    # Description: Creates NPCs on a map. Their random numbers come from the
+    #              game's generator only once they start moving, so creating
+    #              them doesn't affect the game.
+    #
+    #      Inputs: locations - List of (ID, column, row) tuples, with columns
+    #                          and rows counted from 1.
+    #              level_map - The map they're on ('None' for the current
+    #                          map).
+    #
+    #     Outputs: List of NPCs, or an 'NPCStore' if the NPC store is in use.
+    #---------------------------------------------------------------------------
+    def create_NPCs(self, locations, level_map=None):
+        if level_map is None:
+            level_map = self.map
+        NPCs = []
+        for NPC in locations:
+            NPCs.append(characters.NonPlayerCharacter(
+                NPC[0], self.character_tiles, level_map, self.screen,
+                (NPC[1] - 1) * MAP_TILE_SIZE, (NPC[2] - 1) * MAP_TILE_SIZE,
+                rng=self.rng, clock=self.clock))
+        if self.use_npc_store:
+            NPCs = npc_store.NPCStore(NPCs, self.character_tiles, level_map,
+                                      self.screen, self.clock)
+        return NPCs
 
     #---------------------------------------------------------------------------
     #      Method: game_logic
     #
     # Description: Determines game behavior according to keyboard input and
-    #              interactions among all active objects.
+    #              interactions among all active objects. If rewinding is
+    #              enabled, each resulting state is remembered, and while
+    #              REWIND_KEY is held the game steps back one state instead.
     #
     #      Inputs: keys     - Keys that are currently pressed down.
     #              new_keys - Keys that have just begun to be pressed down.
@@ -91,63 +265,373 @@ class ToadsAdventure(game.Game):
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def game_logic(self, keys, new_keys):
-        if self.player.get_tile_number_behind() == OPEN_DOOR: # level complete
-            mixer.music.fadeout(MUSIC_FADEOUT_LENGTH)
+        if self.rewind_buffer is not None and rewind.REWIND_KEY in keys:
+            state = self.rewind_buffer.step_back()
+            if state is not None:
+                self.restore_state(state)
+            return
+        self.clock.tick()
+        self.map.stream(self.player.x, self.player.y)
+        if self.player.is_posing(): # everything else waits for the pose
+            if self.player.update_pose() and self.level_complete:
+                self.current_level += 1
+                if self.current_level > NUM_LEVELS:
+                    self.current_level = 1
+                self.load_level(self.current_level)
+        elif self.player.get_flags_behind() & TILE_EXIT: # level complete
+            if not self.headless:
+                mixer.music.fadeout(MUSIC_FADEOUT_LENGTH)
             self.player.victory_pose()
-            self.current_level += 1
-            if self.current_level > NUM_LEVELS:
-                self.current_level = 1
-            self.load_level(self.current_level)
+            self.level_complete = True
         else: # level incomplete, so execute each character's game logic
             self.player.game_logic(keys, new_keys)
-            for NPC in self.NPCs:
-                if NPC.overlaps(self.player):
+            fall_limit = self.map.map_height * MAP_TILE_SIZE
+            if self.use_npc_store:
+                self.NPCs.remove_fallen(fall_limit)
+                self.update_activation()
+                self.NPCs.game_logic()
+            else:
+                self.NPCs = [NPC for NPC in self.NPCs if NPC.y <= fall_limit]
+                self.update_activation()
+                for NPC in self.NPCs:
+                    if NPC.is_active:
+                        NPC.game_logic()
+            self.resolve_overlaps()
+        if self.rewind_buffer is not None:
+            self.rewind_buffer.record(self.save_state())
+
+    #---------------------------------------------------------------------------
+    #      Method: update_activation
+    #
+    # Description: Wakes NPCs that are within NPC_WAKE_MARGIN tiles of the
+    #              visible screen area and freezes those farther away than
+    #              NPC_SLEEP_MARGIN tiles, so off-screen NPCs cost nothing.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def update_activation(self):
+        # top-left pixel displayed, as in 'paint'
+        camera_x = self.player.x - (self.width // 2)
+        camera_y = self.player.y - (self.height // 2)
+        wake_margin = NPC_WAKE_MARGIN * MAP_TILE_SIZE
+        sleep_margin = NPC_SLEEP_MARGIN * MAP_TILE_SIZE
+        if self.use_npc_store:
+            self.NPCs.update_activation(camera_x, camera_y,
+                                        camera_x + self.width,
+                                        camera_y + self.height, wake_margin,
+                                        sleep_margin)
+            return
+        for NPC in self.NPCs:
+            if NPC.is_active:
+                margin = sleep_margin
+            else:
+                margin = wake_margin
+            is_active = (camera_x - margin <= NPC.x <=
+                         camera_x + self.width + margin and
+                         camera_y - margin <= NPC.y <=
+                         camera_y + self.height + margin)
+            if NPC.is_active and not is_active: # no interpolation while frozen
+                (NPC.prev_x, NPC.prev_y) = (NPC.x, NPC.y)
+            NPC.is_active = is_active
+
+    #---------------------------------------------------------------------------
+    #      Method: resolve_overlaps
+    #
+    # Description: Inserts every character into the spatial hash, then handles
+    #              each overlapping pair: NPCs damage the player and, if
+    #              NPC_BUMPING is set, NPCs bump into one another. (An
+    #              'NPCStore' finds its own pairs with vectorized operations.)
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def resolve_overlaps(self):
+        if self.use_npc_store:
+            for NPC in self.NPCs.get_overlapping(self.player):
+                if NPC.overlaps(self.player): # player may have respawned
                     self.player.take_damage()
-                if NPC.y > self.map.map_height * MAP_TILE_SIZE:
-                    self.NPCs.remove(NPC)
-                else:
-                    NPC.game_logic()
+            if NPC_BUMPING:
+                self.NPCs.bump_pairs(*self.NPCs.get_overlapping_pairs(
+                    self.spatial_hash.cell_size))
+            return
+        self.spatial_hash.clear()
+        self.spatial_hash.insert(self.player) # always first in each pair
+        for NPC in self.NPCs:
+            if NPC.is_active:
+                self.spatial_hash.insert(NPC)
+        for (a, b) in self.spatial_hash.get_pairs():
+            if not a.overlaps(b):
+                continue
+            if a is self.player:
+                self.player.take_damage()
+            elif NPC_BUMPING:
+                a.bump(b)
+                b.bump(a)
+
+    #---------------------------------------------------------------------------
+    #      Method: save_state
+    #
+    # Description: Takes a snapshot of the game, cheap enough to take every
+    #              tick. The map is shared with the snapshot rather than copied.
+    #
+    #      Inputs: None.
+    #
+    #     Outputs: A 'GameState'.
+    #---------------------------------------------------------------------------
+    def save_state(self):
+        if self.use_npc_store:
+            NPC_state = self.NPCs.get_state()
+        else:
+            NPC_state = b''.join([NPC.get_state() for NPC in self.NPCs])
+        return game_state.GameState(self.current_level, self.level_complete,
+                                    self.map, self.clock.ticks,
+                                    self.rng.getstate(),
+                                    self.player.get_state(), NPC_state)
+
+    #---------------------------------------------------------------------------
+    #      Method: restore_state
+    #
+    # Description: Returns the game to a snapshot taken by 'save_state' (or
+    #              decoded by 'GameState.from_bytes', in which case the map is
+    #              loaded again unless its level is already current). Existing
+    #              character objects are reused where possible, and the
+    #              snapshot itself is left unchanged, so it may be restored any
+    #              number of times. If the level changes, the level after it
+    #              starts being prepared (see 'preload_level').
+    #
+    #      Inputs: state - The 'GameState' to restore.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def restore_state(self, state):
+        level_changed = state.level != self.current_level
+        previous_map = self.map
+        if state.map is not None:
+            self.map = state.map
+        elif level_changed:
+            self.map = map.Map(state.level, self.map_tiles, self.screen,
+                               self.width, self.height)
+        self.map.reuse_view(previous_map)
+        if level_changed and not self.headless:
+            mixer.music.load(MUSIC[state.level])
+            mixer.music.play(-1)
+        self.current_level = state.level
+        if level_changed and self.preload:
+            self.preload_level(state.level % NUM_LEVELS + 1)
+        self.level_complete = state.level_complete
+        self.clock.ticks = state.ticks
+        self.rng.setstate(state.rng_state)
+        self.player.map = self.map
+        self.player.set_state(state.player)
+        if self.use_npc_store:
+            if self.NPCs.map is not self.map:
+                self.NPCs = self.create_NPCs([])
+            self.NPCs.set_state(state.NPCs)
+        else:
+            NPC_state = characters.NonPlayerCharacter.STATE
+            NPCs = self.NPCs[:len(state.NPCs) // NPC_state.size]
+            for offset in range(0, len(state.NPCs), NPC_state.size):
+                if offset // NPC_state.size == len(NPCs):
+                    ID = NPC_state.unpack_from(state.NPCs, offset)[0]
+                    NPCs.append(characters.NonPlayerCharacter(
+                        ID, self.character_tiles, self.map, self.screen, 0,
+                        0, rng=self.rng, clock=self.clock))
+                NPC = NPCs[offset // NPC_state.size]
+                NPC.map = self.map
+                NPC.set_state(state.NPCs, offset)
+            self.NPCs = NPCs
 
     #---------------------------------------------------------------------------
     #      Method: paint
     #
-    # Description: Draws the map/level and active game objects onto the screen.
+    # Description: Draws the map/level and active game objects onto the screen,
+    #              placing characters between their previous and current
+    #              positions according to 'alpha'. In dirty-rect mode, frames
+    #              in which the map hasn't scrolled only redraw the areas
+    #              whose characters changed (see 'paint_changes').
     #
     #      Inputs: surface - The surface onto which everything will be drawn.
+    #              alpha   - Fraction of a tick elapsed since the last call to
+    #                        'game_logic' (0.0 to 1.0).
     #
     #     Outputs: None.
     #---------------------------------------------------------------------------
-    def paint(self, surface):
+    def paint(self, surface, alpha=1.0):
         # determine top-left pixel to be displayed
-        x = self.player.x - (self.width // 2)
-        y = self.player.y - (self.height // 2)
+        (player_x, player_y) = self.player.get_interpolated_position(alpha)
+        x = player_x - (self.width // 2)
+        y = player_y - (self.height // 2)
+        if (self.use_dirty_rects and not self.needs_redraw and
+            self.map.is_view_at(x, y)):
+            self.paint_changes(surface, x, y, alpha)
+            return
 
         # draw currently-visible map tiles and game characters
-        self.map.draw(x, y)
-        self.player.draw((self.width // 2 - MAP_TILE_SIZE,
-                          self.height // 2 - MAP_TILE_SIZE))
-        for NPC in self.NPCs:
-            NPC.draw(x, y)
+        self.needs_redraw = False
+        self.damage = None
+        queue = self.render_queue
+        self.map.draw(x, y, queue)
+        queue.flush(surface) # separately, so each phase is timed
+        self.mark_phase('map')
+        self.sprites = self.get_sprites(x, y, alpha)
+        queue.extend(self.sprites, render_queue.RENDER_LAYER_CHARACTERS)
+        queue.flush(surface)
+        self.mark_phase('characters')
+
+    #---------------------------------------------------------------------------
+    #      Method: get_sprites
+    #
+    # Description: Lists what to draw for each visible character, in drawing
+    #              order.
+    #
+    #      Inputs: x     - Left-most map pixel currently displayed.
+    #              y     - Top-most map pixel currently displayed.
+    #              alpha - Fraction of a tick elapsed since the last call to
+    #                      'game_logic', for interpolation.
+    #
+    #     Outputs: List of (surface, position) tuples.
+    #---------------------------------------------------------------------------
+    def get_sprites(self, x, y, alpha):
+        sprites = []
+        sprite = self.player.get_sprite((self.width // 2 - MAP_TILE_SIZE,
+                                         self.height // 2 - MAP_TILE_SIZE))
+        if sprite is not None:
+            sprites.append(sprite)
+        if not self.player.is_posing(): # only Toad is shown while posing
+            for NPC in self.NPCs:
+                sprite = NPC.get_sprite(x, y, alpha)
+                if sprite is not None:
+                    sprites.append(sprite)
+        return sprites
+
+    #---------------------------------------------------------------------------
+    #      Method: paint_changes
+    #
+    # Description: Redraws only the areas of the screen where a character
+    #              appeared or disappeared since the previous frame (the map
+    #              being unchanged), and reports them as 'damage'. Each area
+    #              is redrawn by 'repaint'.
+    #
+    #      Inputs: surface - The surface on which to draw.
+    #              x       - Left-most map pixel currently displayed.
+    #              y       - Top-most map pixel currently displayed.
+    #              alpha   - Fraction of a tick elapsed since the last call to
+    #                        'game_logic', for interpolation.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def paint_changes(self, surface, x, y, alpha):
+        sprites = self.get_sprites(x, y, alpha)
+        if sprites == self.sprites: # nothing moved
+            self.damage = []
+            self.mark_phase('characters')
+            return
+        changed = set(sprites).symmetric_difference(self.sprites)
+        self.damage = [pygame.Rect(position, image.get_size())
+                       for (image, position) in changed]
+        self.sprites = sprites
+        self.repaint(surface, self.damage)
+        self.mark_phase('characters')
+
+    #---------------------------------------------------------------------------
+    #      Method: repaint
+    #
+    # Description: Redraws areas of the screen as the latest call to 'paint'
+    #              left them: within each area the map is restored from its
+    #              back-buffer and every character overlapping it is drawn
+    #              again.
+    #
+    #      Inputs: surface - The surface on which to draw.
+    #              rects   - List of 'Rect' objects covering the areas to
+    #                        redraw.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def repaint(self, surface, rects):
+        sprites = self.sprites
+        sprite_rects = [pygame.Rect(position, image.get_size())
+                        for (image, position) in sprites]
+        queue = self.render_queue
+        for rect in rects:
+            self.map.restore(rect, queue)
+            queue.extend([sprites[i]
+                          for i in rect.collidelistall(sprite_rects)],
+                         render_queue.RENDER_LAYER_CHARACTERS)
+            surface.set_clip(rect)
+            queue.flush(surface)
+        surface.set_clip(None)
 
 #-------------------------------------------------------------------------------
 #    Function: main
 #
 # Description: Creates and runs Toad's Adventure. If a command-line integer is
 #              provided, it may determine the starting level, otherwise the game
-#              starts at level 1.
+#              starts at level 1. With '--headless FRAMES', the given number of
+#              frames are simulated without opening a display ('--offscreen'
+#              additionally renders each frame to an offscreen surface).
+#              '--timings' records how long each phase of a frame takes,
+#              '--overlay' shows those timings on screen (toggled with F3),
+#              and '--timings-file FILE' saves them to FILE on exit.
+#              '--record FILE' saves every tick's input to FILE on exit, and
+#              '--replay FILE' plays such a file back (its level, speed, and
+#              seed override the other options). '--rewind' lets Backspace
+#              scrub backwards through the last few minutes of play.
+#              '--dirty-rects' updates only the changed parts of the display.
 #
-#      Inputs: None, but starting level may be set via command line.
+#      Inputs: None, but options may be set via command line.
 #
 #     Outputs: None.
 #-------------------------------------------------------------------------------
 def main():
-    if len(sys.argv) > 1:
-        starting_level = int(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Toad's Adventure")
+    parser.add_argument('level', type=int, nargs='?', default=1,
+                        help='starting level')
+    parser.add_argument('--headless', type=int, metavar='FRAMES',
+                        help='simulate FRAMES frames without a display')
+    parser.add_argument('--offscreen', action='store_true',
+                        help='render to an offscreen surface when headless')
+    parser.add_argument('--npc-store', action='store_true',
+                        default=USE_NPC_STORE,
+                        help='update NPCs with vectorized NumPy operations')
+    parser.add_argument('--timings', action='store_true',
+                        help='record per-phase frame timings')
+    parser.add_argument('--overlay', action='store_true',
+                        help='show frame timings on screen (F3 toggles)')
+    parser.add_argument('--timings-file', metavar='FILE',
+                        help='save frame timing histograms to FILE on exit')
+    parser.add_argument('--seed', type=int,
+                        help='seed for random numbers')
+    parser.add_argument('--record', metavar='FILE',
+                        help='save input to FILE on exit, for replay')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='replay input recorded in FILE')
+    parser.add_argument('--rewind', action='store_true', default=USE_REWIND,
+                        help='hold Backspace to rewind')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        default=USE_DIRTY_RECTS,
+                        help='update only the changed parts of the display')
+    args = parser.parse_args()
+    headless = args.headless is not None
+    (level, fps, seed, inputs) = (args.level, FRAMES_PER_SECOND, args.seed,
+                                  None)
+    if args.replay:
+        (level, fps, seed, inputs) = input_file.load_inputs(args.replay)
+    game = ToadsAdventure(level, MAP_TILES_FILENAME,
+                          CHARACTER_TILES_FILENAME, fps=fps, headless=headless,
+                          offscreen=args.offscreen,
+                          use_npc_store=args.npc_store,
+                          timings=args.timings, overlay=args.overlay,
+                          timings_filename=args.timings_file, seed=seed,
+                          record_filename=args.record,
+                          use_rewind=args.rewind,
+                          dirty_rects=args.dirty_rects)
+    if headless:
+        game.run_headless(args.headless, inputs)
     else:
-        starting_level = 1
-    game = ToadsAdventure(starting_level, MAP_TILES_FILENAME,
-                          CHARACTER_TILES_FILENAME)
-    game.main_loop()
+        game.main_loop(inputs)
 
 if __name__ == '__main__':
     main()